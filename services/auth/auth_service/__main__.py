@@ -12,6 +12,7 @@ def main() -> int:
         host=settings.host,
         port=settings.port,
         log_level=settings.log_level.lower(),
+        access_log=settings.access_log_sample_rate > 0,
     )
     return 0
 
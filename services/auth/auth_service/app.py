@@ -1,18 +1,77 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import math
+import os
+import time
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
+from pathlib import Path
 
-from fastapi import FastAPI, HTTPException, Request
-from azure.keyvault.secrets import SecretClient
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from azure.keyvault.secrets.aio import SecretClient
 
 from .auth import build_user, parse_token, require_dashboard_api_key
+from .backends import LocalStateBackend, RedisStateBackend, StateBackend
 from .config import Settings, TokenParts
+from .ingest import UsageIngestor
+from .limits import KeyLimits
 from .logging import configure_logging
-from .models import AuthResponse, TokenRequest, UsageReport
-from .state import RateLimiter, SecretCache, UsageTracker
-from .vault import create_secret_client, validate_token
+from .metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    REJECTIONS,
+    MetricFamily,
+    MetricsMiddleware,
+    counter,
+    gauge,
+)
+from .models import (
+    AuthResponse,
+    ReservationResponse,
+    ReserveRequest,
+    SettleRequest,
+    TokenRequest,
+    UsageBatchRequest,
+    UsageBatchResponse,
+    UsageBatchResult,
+    UsageReport,
+)
+from .responses import ResponseCache
+from .snapshot import decode_snapshot_key, digest_key, load_snapshot, save_snapshot
+from .state import (
+    Admission,
+    KeyDigests,
+    LeaseTable,
+    MultiWindowLimiter,
+    RateLimitEngine,
+    Reservation,
+    ReservationBook,
+    ResultCache,
+    SecretCache,
+    SingleFlight,
+    UsageState,
+    UsageTracker,
+    create_rate_limiter,
+)
+from .timing import ServerTimingMiddleware, record_phase
+from .tracing import (
+    Tracing,
+    TracingMiddleware,
+    configure_tracing,
+    shutdown_tracing,
+    start_span,
+)
+from .usage_log import UsageLog
+from .vault import (
+    VaultSync,
+    create_credential,
+    create_secret_client,
+    prewarm_cache,
+    validate_token,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,8 +81,16 @@ class AppState:
     settings: Settings
     secret_cache: SecretCache
     usage_tracker: UsageTracker
-    rate_limiter: RateLimiter
+    rate_limiter: RateLimitEngine
+    custom_limiter: MultiWindowLimiter
+    leases: LeaseTable
+    responses: ResponseCache
     secret_client: SecretClient
+    secret_lookups: SingleFlight
+    backend: StateBackend
+    ingestor: UsageIngestor | None
+    tracing: Tracing | None
+    ready: asyncio.Event
 
 
 def _require_token(token: str | None, settings: Settings) -> TokenParts:
@@ -35,48 +102,607 @@ def _require_token(token: str | None, settings: Settings) -> TokenParts:
     return parts
 
 
-async def _validate_token(
+async def _validate_key(
     *,
     token: str | None,
     state: AppState,
-) -> TokenParts:
+) -> tuple[TokenParts, KeyLimits | None]:
+    start = time.perf_counter_ns()
     parts = _require_token(token, state.settings)
+    record_phase("parse", start)
     try:
         match = await validate_token(
             token_parts=parts,
             client=state.secret_client,
             cache=state.secret_cache,
+            lookups=state.secret_lookups,
+            outage_grace_seconds=state.settings.key_vault_outage_grace_seconds,
         )
     except RuntimeError as exc:
         raise HTTPException(status_code=503, detail="Auth backend unavailable") from exc
     if not match.matched:
         raise HTTPException(status_code=401, detail="Invalid API key")
-    return parts
+    return parts, match.limits
+
+
+def _lease_releases(state: AppState, reports: int = 1) -> int:
+    # Leases are only taken while a concurrency limit is set.
+    return reports if state.settings.concurrency_limit > 0 else 0
+
+
+async def _release_leases(state: AppState, key_id: str, count: int) -> None:
+    # Only after a failed backend call that would have released them. A lost release
+    # holds the slot until the lease TTL runs out.
+    if count <= 0:
+        return
+    try:
+        await state.backend.release_lease(key_id, count)
+    except RuntimeError:
+        logger.warning("Failed to release concurrency lease", extra={"key_id": key_id})
+
+
+def _raise_rejection(state: AppState, admission: Admission) -> None:
+    if admission.rejected is None:
+        return
+    REJECTIONS.inc(admission.rejected)
+    if admission.rejected == "quota":
+        raise HTTPException(status_code=402, detail="Out of quota")
+    if admission.rejected == "concurrency":
+        raise HTTPException(
+            status_code=429,
+            detail="Concurrency limit exceeded",
+            headers={"Retry-After": str(state.settings.concurrency_retry_after_seconds)},
+        )
+    headers = None
+    if admission.rejected == "custom_rate_limit":
+        headers = {"Retry-After": str(max(math.ceil(admission.retry_after), 1))}
+    raise HTTPException(status_code=429, detail="Rate limit exceeded", headers=headers)
+
+
+def _windows(limits: KeyLimits | None, tag: str | None) -> list[tuple[int, float]]:
+    if limits is None or tag is None:
+        return []
+    return limits.active_windows(tag)
+
+
+async def _authorize(
+    state: AppState,
+    key_id: str,
+    limits: KeyLimits | None,
+    tag: str | None,
+    *,
+    lease: bool = False,
+) -> UsageState:
+    # Custom limits, the rate limit, quota and the lease are one backend call, and none
+    # of them is charged unless all of them pass.
+    start = time.perf_counter_ns()
+    try:
+        with start_span("state.authorize", {"auth.key_id": key_id}):
+            admission = await state.backend.authorize(
+                key_id,
+                tag=tag,
+                windows=_windows(limits, tag),
+                lease_limit=state.settings.concurrency_limit if lease else 0,
+            )
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail="State backend unavailable") from exc
+    record_phase("ratelimit", start)
+    _raise_rejection(state, admission)
+    return admission.usage_state
 
 
-def _check_rate_limit(state: AppState, key_id: str) -> None:
-    if not state.rate_limiter.allow(key_id):
+async def _admit(state: AppState, key_id: str) -> None:
+    start = time.perf_counter_ns()
+    release_leases = _lease_releases(state)
+    try:
+        with start_span("state.authorize", {"auth.key_id": key_id}):
+            allowed = await state.backend.admit(key_id, release_leases=release_leases)
+    except RuntimeError as exc:
+        await _release_leases(state, key_id, release_leases)
+        raise HTTPException(status_code=503, detail="State backend unavailable") from exc
+    record_phase("ratelimit", start)
+    if not allowed:
+        REJECTIONS.inc("rate_limit")
         raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
 
+def _user_response(
+    state: AppState, key_id: str, usage_state: UsageState, limits: KeyLimits | None = None
+) -> Response:
+    start = time.perf_counter_ns()
+    body = state.responses.render(key_id, usage_state.balance, usage_state.used, limits)
+    record_phase("serialize", start)
+    return Response(content=body, media_type="application/json")
+
+
+def _idempotency_key(request: Request, payload: UsageReport) -> str | None:
+    key = request.headers.get("idempotency-key") or payload.idempotency_key
+    if key is not None and len(key) > 255:
+        raise HTTPException(status_code=422, detail="Invalid idempotency key")
+    return key
+
+
+async def _report(
+    state: AppState,
+    key_id: str,
+    tokens: int,
+    idempotency_key: str | None = None,
+    *,
+    release_leases: int = 0,
+) -> UsageState:
+    start = time.perf_counter_ns()
+    try:
+        with start_span("usage.consume", {"auth.key_id": key_id, "usage.tokens": tokens}):
+            allowed, usage_state, out_of_quota, _ = await state.backend.report(
+                key_id, tokens, idempotency_key, release_leases=release_leases
+            )
+    except RuntimeError as exc:
+        await _release_leases(state, key_id, release_leases)
+        raise HTTPException(status_code=503, detail="State backend unavailable") from exc
+    record_phase("usage", start)
+    if not allowed:
+        REJECTIONS.inc("rate_limit")
+        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+    if out_of_quota:
+        REJECTIONS.inc("quota")
+        raise HTTPException(status_code=402, detail="Out of quota")
+    return usage_state
+
+
+async def _charge(state: AppState, key_id: str, tokens: int) -> UsageState:
+    start = time.perf_counter_ns()
+    try:
+        with start_span("usage.consume", {"auth.key_id": key_id, "usage.tokens": tokens}):
+            usage_state, out_of_quota = await state.backend.charge(key_id, tokens)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail="State backend unavailable") from exc
+    record_phase("usage", start)
+    if out_of_quota:
+        REJECTIONS.inc("quota")
+        raise HTTPException(status_code=402, detail="Out of quota")
+    return usage_state
+
+
+async def _reserve(
+    state: AppState, key_id: str, amount: int, limits: KeyLimits | None, tag: str | None
+) -> tuple[UsageState, str, float]:
+    start = time.perf_counter_ns()
+    try:
+        with start_span("usage.reserve", {"auth.key_id": key_id, "usage.tokens": amount}):
+            admission, reservation_id, expires_at = await state.backend.reserve(
+                key_id,
+                amount,
+                state.settings.quota_reservation_ttl_seconds,
+                tag=tag,
+                windows=_windows(limits, tag),
+                lease_limit=state.settings.concurrency_limit,
+            )
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail="State backend unavailable") from exc
+    record_phase("usage", start)
+    _raise_rejection(state, admission)
+    assert reservation_id is not None
+    return admission.usage_state, reservation_id, expires_at
+
+
+async def _settle(
+    state: AppState, key_id: str, reservation_id: str, tokens: int
+) -> UsageState:
+    start = time.perf_counter_ns()
+    release_leases = _lease_releases(state)
+    try:
+        with start_span("usage.settle", {"auth.key_id": key_id, "usage.tokens": tokens}):
+            usage_state, out_of_quota, _ = await state.backend.settle(
+                key_id, reservation_id, tokens, release_leases=release_leases
+            )
+    except RuntimeError as exc:
+        await _release_leases(state, key_id, release_leases)
+        raise HTTPException(status_code=503, detail="State backend unavailable") from exc
+    record_phase("usage", start)
+    if out_of_quota:
+        REJECTIONS.inc("quota")
+        raise HTTPException(status_code=402, detail="Out of quota")
+    return usage_state
+
+
+async def _validate_batch_key(
+    token: str | None, state: AppState
+) -> tuple[TokenParts, KeyLimits | None] | HTTPException:
+    try:
+        return await _validate_key(token=token, state=state)
+    except HTTPException as exc:
+        return exc
+
+
+async def _report_batch_key(
+    state: AppState, key_id: str, tokens: int, reports: int
+) -> UsageState | HTTPException:
+    try:
+        return await _report(
+            state, key_id, tokens, release_leases=_lease_releases(state, reports)
+        )
+    except HTTPException as exc:
+        return exc
+
+
+def _batch_result(
+    key_id: str, limits: KeyLimits | None, outcome: UsageState | HTTPException
+) -> UsageBatchResult:
+    if isinstance(outcome, HTTPException):
+        return UsageBatchResult(status=outcome.status_code, detail=outcome.detail)
+    # Same fields as the /usage body rendered from the response template.
+    user = build_user(
+        key_id=key_id,
+        balance=outcome.balance,
+        used=outcome.used,
+        custom_rate_limits=limits.rules if limits else None,
+    )
+    return UsageBatchResult(status=200, data=user)
+
+
+def _state_metrics(state: AppState) -> list[MetricFamily]:
+    cache = state.secret_cache.stats()
+    limiter = state.rate_limiter.stats()
+    custom = state.custom_limiter.stats()
+    leases = state.leases.stats()
+    lookups = state.secret_lookups.stats()
+    families = [
+        counter("auth_secret_cache_hits_total", "Secret cache hits.", cache["hits"]),
+        counter(
+            "auth_secret_cache_negative_hits_total",
+            "Secret cache hits on a known-missing key.",
+            cache["negative_hits"],
+        ),
+        counter("auth_secret_cache_misses_total", "Secret cache misses.", cache["misses"]),
+        counter(
+            "auth_secret_cache_evictions_total", "Secret cache LRU evictions.", cache["evictions"]
+        ),
+        gauge("auth_secret_cache_entries", "Cached secrets.", cache["size"]),
+        gauge("auth_secret_cache_negative_entries", "Cached misses.", cache["negative_size"]),
+        counter(
+            "auth_key_vault_lookups_coalesced_total",
+            "Key Vault lookups joined to one already in flight.",
+            lookups["coalesced"],
+        ),
+        gauge(
+            "auth_key_vault_lookups_in_flight", "Key Vault lookups in flight.", lookups["in_flight"]
+        ),
+        counter(
+            "auth_rate_limiter_rejections_total",
+            "Requests refused by the in-process rate limiter.",
+            limiter["rejected"],
+        ),
+        gauge("auth_rate_limiter_keys", "Keys tracked by the rate limiter.", limiter["keys"]),
+        counter(
+            "auth_custom_limiter_rejections_total",
+            "Requests refused by in-process customRateLimits.",
+            custom["rejected"],
+        ),
+        gauge("auth_custom_limiter_keys", "Key and tag pairs tracked.", custom["keys"]),
+        gauge("auth_lease_keys", "Keys holding concurrency leases.", leases["keys"]),
+        gauge("auth_usage_keys", "Keys tracked for usage.", state.usage_tracker.stats()["keys"]),
+    ]
+    if state.ingestor is not None:
+        ingest = state.ingestor.stats()
+        families.append(
+            gauge("auth_usage_ingest_pending", "Queued usage reports.", ingest["pending"])
+        )
+        families.append(
+            counter(
+                "auth_usage_ingest_rejected_total",
+                "Usage reports refused by a full ingest queue.",
+                ingest["rejected"],
+            )
+        )
+    return families
+
+
+async def _prewarm(state: AppState) -> None:
+    settings = state.settings
+    try:
+        count = await asyncio.wait_for(
+            prewarm_cache(
+                prefix=settings.api_key_prefix,
+                client=state.secret_client,
+                cache=state.secret_cache,
+                lookups=state.secret_lookups,
+                concurrency=settings.api_key_cache_prewarm_concurrency,
+            ),
+            timeout=settings.api_key_cache_prewarm_timeout_seconds,
+        )
+        logger.info("Secret cache prewarmed", extra={"secrets": count})
+    except TimeoutError:
+        logger.warning("Secret cache prewarm deadline reached")
+    except Exception:
+        logger.exception("Secret cache prewarm failed")
+    finally:
+        state.ready.set()
+
+
+async def _sync_loop(state: AppState, sync: VaultSync) -> None:
+    interval = state.settings.key_vault_sync_interval_seconds
+    while True:
+        try:
+            result = await sync.sync_once()
+            logger.debug(
+                "Key Vault sync complete",
+                extra={"fetched": result.fetched, "revoked": result.revoked},
+            )
+        except Exception:
+            logger.exception("Key Vault sync failed")
+        # The first pass doubles as the prewarm when sync is enabled.
+        state.ready.set()
+        await asyncio.sleep(interval)
+
+
+def _create_digests(settings: Settings) -> tuple[KeyDigests | None, bytes | None]:
+    if settings.auth_snapshot_path and settings.auth_snapshot_key:
+        snapshot_key = decode_snapshot_key(settings.auth_snapshot_key)
+        digests = KeyDigests(digest_key(snapshot_key), settings.api_key_cache_max_entries)
+        entries = load_snapshot(Path(settings.auth_snapshot_path), snapshot_key)
+        digests.load(entries)
+        logger.info("Loaded auth snapshot", extra={"keys": len(entries)})
+        return digests, snapshot_key
+    if settings.key_vault_outage_grace_seconds > 0:
+        return KeyDigests(os.urandom(32), settings.api_key_cache_max_entries), None
+    return None, None
+
+
+async def _write_snapshot(path: Path, key: bytes, digests: KeyDigests) -> None:
+    try:
+        await asyncio.to_thread(save_snapshot, path, key, digests)
+    except Exception:
+        logger.exception("Failed to write auth snapshot", extra={"path": str(path)})
+
+
+async def _snapshot_loop(path: Path, key: bytes, digests: KeyDigests, interval: int) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await _write_snapshot(path, key, digests)
+
+
+async def _janitor_loop(state: AppState) -> None:
+    interval = state.settings.state_janitor_interval_seconds
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            limiter_evicted = await asyncio.to_thread(state.rate_limiter.evict_idle)
+            custom_evicted = await asyncio.to_thread(state.custom_limiter.evict_idle)
+            leases_evicted = await asyncio.to_thread(state.leases.evict_idle)
+            usage_evicted = await asyncio.to_thread(state.usage_tracker.evict_idle)
+        except Exception:
+            logger.exception("State janitor failed")
+            continue
+        logger.debug(
+            "State janitor pass complete",
+            extra={
+                "rate_limiter_evicted": limiter_evicted,
+                "custom_limiter_evicted": custom_evicted,
+                "leases_evicted": leases_evicted,
+                "usage_evicted": usage_evicted,
+                "rate_limiter_keys": state.rate_limiter.stats()["keys"],
+                "usage_keys": state.usage_tracker.stats()["keys"],
+            },
+        )
+
+
+def _open_usage_log(
+    settings: Settings,
+) -> tuple[UsageLog | None, dict[str, tuple[int, int]], list[Reservation]]:
+    if not settings.usage_log_dir:
+        return None, {}, []
+    usage_log = UsageLog(
+        Path(settings.usage_log_dir),
+        flush_interval_seconds=settings.usage_log_flush_interval_ms / 1000.0,
+    )
+    recovered, holds = usage_log.recover()
+    logger.info("Recovered usage state", extra={"keys": len(recovered), "holds": len(holds)})
+    usage_log.start()
+    states = {key_id: (r.balance, r.used) for key_id, r in recovered.items()}
+    return usage_log, states, list(holds.values())
+
+
+async def _write_usage_snapshot(
+    usage_log: UsageLog, tracker: UsageTracker, reservations: ReservationBook
+) -> None:
+    try:
+        await asyncio.to_thread(usage_log.snapshot, tracker.export, reservations.export)
+    except Exception:
+        logger.exception("Failed to write usage snapshot")
+
+
+async def _usage_snapshot_loop(
+    usage_log: UsageLog, tracker: UsageTracker, reservations: ReservationBook, interval: int
+) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await _write_usage_snapshot(usage_log, tracker, reservations)
+
+
+async def _reservation_sweep_loop(state: AppState) -> None:
+    interval = state.settings.quota_reservation_sweep_interval_seconds
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            released = await state.backend.sweep()
+        except Exception:
+            logger.exception("Reservation sweep failed")
+            continue
+        if released:
+            logger.info("Released expired reservations", extra={"released": released})
+
+
+def _create_backend(
+    settings: Settings,
+    usage_tracker: UsageTracker,
+    rate_limiter: RateLimitEngine,
+    custom_limiter: MultiWindowLimiter,
+    leases: LeaseTable,
+    reservations: ReservationBook,
+) -> StateBackend:
+    if settings.state_backend == "redis" and settings.redis_url:
+        return RedisStateBackend.from_url(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            key_prefix=settings.redis_key_prefix,
+            default_balance=settings.default_wallet_balance,
+            limit_per_minute=settings.rate_limit_per_minute,
+            idempotency_ttl_seconds=settings.usage_idempotency_ttl_seconds,
+            lease_ttl_seconds=settings.concurrency_lease_ttl_seconds,
+        )
+    return LocalStateBackend(
+        usage_tracker,
+        rate_limiter,
+        reservations,
+        ResultCache(
+            settings.usage_idempotency_ttl_seconds,
+            settings.usage_idempotency_max_entries,
+            settings.state_shards,
+        ),
+        ResultCache(
+            settings.usage_idempotency_ttl_seconds,
+            settings.usage_idempotency_max_entries,
+            settings.state_shards,
+        ),
+        custom_limiter,
+        leases,
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     settings = Settings()
-    configure_logging(settings.log_level)
+    configure_logging(
+        settings.log_level,
+        fmt=settings.log_format,
+        queued=settings.log_queue,
+        access_sample_rate=settings.access_log_sample_rate,
+    )
     logger.info("Starting auth service", extra={"vault": settings.key_vault_url})
-    secret_client = create_secret_client(settings)
+    tracing = configure_tracing(
+        settings.tracing_exporter,
+        service_name=settings.tracing_service_name,
+        file_path=settings.tracing_file_path,
+    )
+    digests, snapshot_key = _create_digests(settings)
+    usage_log, usage_states, holds = _open_usage_log(settings)
+    usage_tracker = UsageTracker(settings.default_wallet_balance, settings.state_shards, usage_log)
+    usage_tracker.load(usage_states)
+    reservations = ReservationBook(settings.state_shards, usage_log)
+    reservations.load(holds)
+    rate_limiter = create_rate_limiter(
+        settings.rate_limiter_engine,
+        settings.rate_limit_per_minute,
+        settings.state_shards,
+    )
+    custom_limiter = MultiWindowLimiter(settings.state_shards)
+    leases = LeaseTable(settings.concurrency_lease_ttl_seconds, settings.state_shards)
+    backend = _create_backend(
+        settings, usage_tracker, rate_limiter, custom_limiter, leases, reservations
+    )
+    ingestor = None
+    if settings.usage_ingest_mode == "async":
+        ingestor = UsageIngestor(
+            backend,
+            max_pending=settings.usage_ingest_queue_size,
+            flush_interval_seconds=settings.usage_ingest_flush_interval_ms / 1000.0,
+        )
+    credential = create_credential(settings)
+    secret_client = create_secret_client(settings, credential)
     state = AppState(
         settings=settings,
-        secret_cache=SecretCache(settings.api_key_cache_ttl_seconds),
-        usage_tracker=UsageTracker(settings.default_wallet_balance),
-        rate_limiter=RateLimiter(settings.rate_limit_per_minute),
+        secret_cache=SecretCache(
+            settings.api_key_cache_ttl_seconds,
+            settings.api_key_cache_stale_seconds,
+            max_entries=settings.api_key_cache_max_entries,
+            negative_ttl_seconds=settings.api_key_negative_cache_ttl_seconds,
+            max_negative_entries=settings.api_key_negative_cache_max_entries,
+            digests=digests,
+            shards=settings.state_shards,
+        ),
+        usage_tracker=usage_tracker,
+        rate_limiter=rate_limiter,
+        custom_limiter=custom_limiter,
+        leases=leases,
+        responses=ResponseCache(settings.response_cache_max_entries),
         secret_client=secret_client,
+        secret_lookups=SingleFlight(),
+        backend=backend,
+        ingestor=ingestor,
+        tracing=tracing,
+        ready=asyncio.Event(),
     )
     app.state.auth = state
-    yield
+    unregister_metrics = REGISTRY.register(lambda: _state_metrics(state))
+    tasks: list[asyncio.Task] = []
+    if settings.key_vault_sync_interval_seconds > 0:
+        sync = VaultSync(
+            prefix=settings.api_key_prefix,
+            client=secret_client,
+            cache=state.secret_cache,
+            lookups=state.secret_lookups,
+            concurrency=settings.api_key_cache_prewarm_concurrency,
+        )
+        tasks.append(asyncio.create_task(_sync_loop(state, sync)))
+        if settings.api_key_cache_prewarm:
+            asyncio.get_running_loop().call_later(
+                settings.api_key_cache_prewarm_timeout_seconds, state.ready.set
+            )
+        else:
+            state.ready.set()
+    elif settings.api_key_cache_prewarm:
+        tasks.append(asyncio.create_task(_prewarm(state)))
+    else:
+        state.ready.set()
+    if ingestor is not None:
+        tasks.append(asyncio.create_task(ingestor.run()))
+    tasks.append(asyncio.create_task(_reservation_sweep_loop(state)))
+    if settings.state_janitor_interval_seconds > 0:
+        tasks.append(asyncio.create_task(_janitor_loop(state)))
+    snapshot_path = Path(settings.auth_snapshot_path) if settings.auth_snapshot_path else None
+    if snapshot_path is not None and snapshot_key is not None and digests is not None:
+        tasks.append(
+            asyncio.create_task(
+                _snapshot_loop(
+                    snapshot_path, snapshot_key, digests, settings.auth_snapshot_interval_seconds
+                )
+            )
+        )
+    if usage_log is not None:
+        tasks.append(
+            asyncio.create_task(
+                _usage_snapshot_loop(
+                    usage_log,
+                    usage_tracker,
+                    reservations,
+                    settings.usage_snapshot_interval_seconds,
+                )
+            )
+        )
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if ingestor is not None:
+            await ingestor.drain()
+        if usage_log is not None:
+            await _write_usage_snapshot(usage_log, usage_tracker, reservations)
+            await asyncio.to_thread(usage_log.close)
+        if snapshot_path is not None and snapshot_key is not None and digests is not None:
+            await _write_snapshot(snapshot_path, snapshot_key, digests)
+        unregister_metrics()
+        await backend.close()
+        await secret_client.close()
+        await credential.close()
+        shutdown_tracing(tracing)
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(TracingMiddleware)
 
 
 @app.get("/healthz")
@@ -84,47 +710,134 @@ async def healthz() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics() -> Response:
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/readyz")
+async def readyz(request: Request, response: Response) -> dict[str, str]:
+    state: AppState = request.app.state.auth
+    if not state.ready.is_set():
+        response.status_code = 503
+        return {"status": "warming"}
+    return {"status": "ready"}
+
+
 @app.post("/authorization", response_model=AuthResponse, response_model_exclude_none=True)
-async def authorization(payload: TokenRequest, request: Request) -> AuthResponse:
+async def authorization(payload: TokenRequest, request: Request) -> Response:
     state: AppState = request.app.state.auth
     require_dashboard_api_key(request, state.settings.auth_dashboard_api_key)
-    parts = await _validate_token(token=payload.token, state=state)
+    parts, limits = await _validate_key(token=payload.token, state=state)
     key_id = parts.key_id
-    _check_rate_limit(state, key_id)
-    usage_state = state.usage_tracker.get_state(key_id)
-    if usage_state.balance <= 0:
-        raise HTTPException(status_code=402, detail="Out of quota")
-    user = build_user(key_id=key_id, balance=usage_state.balance, used=usage_state.used)
-    return AuthResponse(data=user)
+    usage_state = await _authorize(state, key_id, limits, payload.rate_limit_tag, lease=True)
+    return _user_response(state, key_id, usage_state, limits)
 
 
 @app.post("/validate", response_model=AuthResponse, response_model_exclude_none=True)
-async def validate(payload: TokenRequest, request: Request) -> AuthResponse:
+async def validate(payload: TokenRequest, request: Request) -> Response:
     state: AppState = request.app.state.auth
     require_dashboard_api_key(request, state.settings.auth_dashboard_api_key)
-    parts = await _validate_token(token=payload.token, state=state)
+    parts, limits = await _validate_key(token=payload.token, state=state)
     key_id = parts.key_id
-    _check_rate_limit(state, key_id)
-    usage_state = state.usage_tracker.get_state(key_id)
-    if usage_state.balance <= 0:
-        raise HTTPException(status_code=402, detail="Out of quota")
-    user = build_user(key_id=key_id, balance=usage_state.balance, used=usage_state.used)
-    return AuthResponse(data=user)
+    # A check only: nothing releases a lease taken here, so /validate never takes one.
+    usage_state = await _authorize(state, key_id, limits, payload.rate_limit_tag)
+    return _user_response(state, key_id, usage_state, limits)
 
 
 @app.post("/usage", response_model=AuthResponse, response_model_exclude_none=True)
-async def usage(payload: UsageReport, request: Request) -> AuthResponse:
+async def usage(payload: UsageReport, request: Request) -> Response:
     state: AppState = request.app.state.auth
     require_dashboard_api_key(request, state.settings.auth_dashboard_api_key)
-    parts = await _validate_token(token=payload.token, state=state)
+    parts, limits = await _validate_key(token=payload.token, state=state)
     key_id = parts.key_id
-    _check_rate_limit(state, key_id)
     tokens = payload.usage.total_tokens if payload.usage else 0
-    usage_state, out_of_quota = state.usage_tracker.consume(key_id, tokens)
-    if out_of_quota:
-        raise HTTPException(status_code=402, detail="Out of quota")
-    user = build_user(key_id=key_id, balance=usage_state.balance, used=usage_state.used)
-    return AuthResponse(data=user)
+    idempotency_key = _idempotency_key(request, payload)
+    # Keyed reports stay synchronous: the dedupe decision has to be made before replying.
+    if idempotency_key is None and state.ingestor is not None:
+        # Queued charges skip the rate limiter, so the admission is taken here, and a full
+        # queue falls back to a direct charge rather than a second admission.
+        await _admit(state, key_id)
+        if state.ingestor.offer(key_id, tokens):
+            return JSONResponse(status_code=202, content={"status": "accepted"})
+        usage_state = await _charge(state, key_id, tokens)
+    else:
+        usage_state = await _report(
+            state, key_id, tokens, idempotency_key, release_leases=_lease_releases(state)
+        )
+    return _user_response(state, key_id, usage_state, limits)
+
+
+@app.post(
+    "/usage/reserve", response_model=ReservationResponse, response_model_exclude_none=True
+)
+async def usage_reserve(payload: ReserveRequest, request: Request) -> ReservationResponse:
+    state: AppState = request.app.state.auth
+    require_dashboard_api_key(request, state.settings.auth_dashboard_api_key)
+    parts, limits = await _validate_key(token=payload.token, state=state)
+    key_id = parts.key_id
+    usage_state, reservation_id, expires_at = await _reserve(
+        state, key_id, payload.estimated_tokens, limits, payload.rate_limit_tag
+    )
+    user = build_user(
+        key_id=key_id,
+        balance=usage_state.balance,
+        used=usage_state.used,
+        custom_rate_limits=limits.rules if limits else None,
+    )
+    return ReservationResponse(data=user, reservation_id=reservation_id, expires_at=expires_at)
+
+
+@app.post("/usage/settle", response_model=AuthResponse, response_model_exclude_none=True)
+async def usage_settle(payload: SettleRequest, request: Request) -> Response:
+    state: AppState = request.app.state.auth
+    require_dashboard_api_key(request, state.settings.auth_dashboard_api_key)
+    parts, limits = await _validate_key(token=payload.token, state=state)
+    key_id = parts.key_id
+    tokens = payload.usage.total_tokens if payload.usage else 0
+    usage_state = await _settle(state, key_id, payload.reservation_id, tokens)
+    return _user_response(state, key_id, usage_state, limits)
+
+
+@app.post("/usage/batch", response_model=UsageBatchResponse, response_model_exclude_none=True)
+async def usage_batch(payload: UsageBatchRequest, request: Request) -> UsageBatchResponse:
+    state: AppState = request.app.state.auth
+    require_dashboard_api_key(request, state.settings.auth_dashboard_api_key)
+    if len(payload.items) > state.settings.usage_batch_max_items:
+        raise HTTPException(status_code=413, detail="Too many usage reports")
+    tokens = list(dict.fromkeys(item.token for item in payload.items))
+    validated = dict(
+        zip(tokens, await asyncio.gather(*(_validate_batch_key(t, state) for t in tokens)))
+    )
+    totals: dict[str, int] = {}
+    reports: dict[str, int] = {}
+    for item in payload.items:
+        key = validated[item.token]
+        if not isinstance(key, HTTPException):
+            key_id = key[0].key_id
+            used = item.usage.total_tokens if item.usage else 0
+            totals[key_id] = totals.get(key_id, 0) + used
+            reports[key_id] = reports.get(key_id, 0) + 1
+    outcomes = dict(
+        zip(
+            totals,
+            await asyncio.gather(
+                *(
+                    _report_batch_key(state, key_id, total, reports[key_id])
+                    for key_id, total in totals.items()
+                )
+            ),
+        )
+    )
+    results: list[UsageBatchResult] = []
+    for item in payload.items:
+        key = validated[item.token]
+        if isinstance(key, HTTPException):
+            results.append(UsageBatchResult(status=key.status_code, detail=key.detail))
+        else:
+            parts, limits = key
+            results.append(_batch_result(parts.key_id, limits, outcomes[parts.key_id]))
+    return UsageBatchResponse(results=results)
 
 
 __all__ = ["app"]
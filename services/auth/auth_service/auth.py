@@ -1,35 +1,40 @@
 from __future__ import annotations
 
 import hmac
-from typing import Optional
+import re
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
 
 from fastapi import HTTPException, Request
 
 from .config import Settings, TokenParts
-from .models import UserData, UserWallet
+from .models import RateLimitRule, UserData, UserWallet
+from .timing import record_phase
+
+
+@lru_cache(maxsize=8)
+def _token_pattern(prefix: str) -> re.Pattern[str]:
+    # One pass over "<prefix>_<key_id>_<secret>" with the same whitespace tolerance as
+    # stripping each part; the key id charset excludes "_", so the split is unambiguous.
+    return re.compile(
+        rf"\s*{re.escape(prefix)}\s*_\s*([a-zA-Z0-9-]{{6,64}})\s*_(.*)", re.DOTALL
+    )
 
 
 def parse_token(token: str, expected_prefix: str) -> Optional[TokenParts]:
-    raw = token.strip()
-    if raw == "":
-        return None
-    parts = raw.split("_")
-    if len(parts) < 3:
-        return None
-    prefix = parts[0].strip()
-    key_id = parts[1].strip()
-    secret = "_".join(parts[2:]).strip()
-    if prefix == "" or key_id == "" or secret == "":
-        return None
-    if prefix != expected_prefix:
+    match = _token_pattern(expected_prefix).fullmatch(token)
+    if match is None:
         return None
-    try:
-        return TokenParts(prefix=prefix, key_id=key_id, secret=secret)
-    except ValueError:
+    key_id, secret = match.groups()
+    secret = secret.strip()
+    if secret == "":
         return None
+    return TokenParts(expected_prefix, key_id, secret)
 
 
 def require_dashboard_api_key(request: Request, expected_key: str) -> None:
+    start = time.perf_counter_ns()
     auth = request.headers.get("authorization")
     if auth is None:
         raise HTTPException(status_code=401, detail="Missing Authorization header")
@@ -38,6 +43,7 @@ def require_dashboard_api_key(request: Request, expected_key: str) -> None:
         raise HTTPException(status_code=401, detail="Invalid Authorization header")
     if not hmac.compare_digest(token.strip(), expected_key):
         raise HTTPException(status_code=401, detail="Invalid dashboard API key")
+    record_phase("auth", start)
 
 
 def build_user(
@@ -45,6 +51,7 @@ def build_user(
     key_id: str,
     balance: int,
     used: Optional[int],
+    custom_rate_limits: Optional[Dict[str, List[RateLimitRule]]] = None,
 ) -> UserData:
     user_id = f"user_{key_id}"
     wallet = UserWallet(total_balance=max(balance, 0), total_used=used)
@@ -53,7 +60,7 @@ def build_user(
         full_name=user_id,
         wallet=wallet,
         metadata=None,
-        customRateLimits=None,
+        customRateLimits=custom_rate_limits,
     )
 
 
@@ -0,0 +1,812 @@
+from __future__ import annotations
+
+import logging
+import secrets
+import time
+from typing import Callable, Optional, Protocol, Sequence
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+
+from .state import (
+    Admission,
+    LeaseTable,
+    MultiWindowLimiter,
+    RateLimitEngine,
+    ReservationBook,
+    ResultCache,
+    UsageState,
+    UsageTracker,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class StateBackend(Protocol):
+    async def authorize(
+        self,
+        key_id: str,
+        *,
+        tag: Optional[str] = None,
+        windows: Sequence[tuple[int, float]] = (),
+        lease_limit: int = 0,
+    ) -> Admission: ...
+
+    async def admit(self, key_id: str, *, release_leases: int = 0) -> bool: ...
+
+    async def report(
+        self,
+        key_id: str,
+        tokens: int,
+        idempotency_key: Optional[str] = None,
+        *,
+        release_leases: int = 0,
+    ) -> tuple[bool, UsageState, bool, bool]: ...
+
+    async def charge(self, key_id: str, tokens: int) -> tuple[UsageState, bool]: ...
+
+    async def release_lease(self, key_id: str, count: int = 1) -> None: ...
+
+    async def reserve(
+        self,
+        key_id: str,
+        amount: int,
+        ttl_seconds: int,
+        *,
+        tag: Optional[str] = None,
+        windows: Sequence[tuple[int, float]] = (),
+        lease_limit: int = 0,
+    ) -> tuple[Admission, Optional[str], float]: ...
+
+    async def settle(
+        self, key_id: str, reservation_id: str, tokens: int, *, release_leases: int = 0
+    ) -> tuple[UsageState, bool, bool]: ...
+
+    async def sweep(self) -> int: ...
+
+    async def close(self) -> None: ...
+
+
+class LocalStateBackend:
+    # Each call runs its checks before any charge, with no await in between, so a
+    # rejected request leaves every limiter and lease untouched.
+    def __init__(
+        self,
+        usage_tracker: UsageTracker,
+        rate_limiter: RateLimitEngine,
+        reservations: ReservationBook,
+        replays: ResultCache[tuple[UsageState, bool]],
+        settlements: ResultCache[tuple[UsageState, bool]],
+        custom_limiter: MultiWindowLimiter,
+        leases: LeaseTable,
+    ) -> None:
+        self._usage_tracker = usage_tracker
+        self._rate_limiter = rate_limiter
+        self._reservations = reservations
+        self._replays = replays
+        self._settlements = settlements
+        self._custom_limiter = custom_limiter
+        self._leases = leases
+
+    def _check(
+        self, key_id: str, tag: Optional[str], windows: Sequence[tuple[int, float]]
+    ) -> Optional[Admission]:
+        if windows:
+            allowed, retry_after = self._custom_limiter.check(f"{key_id}:{tag}", windows)
+            if not allowed:
+                return Admission(
+                    UsageState(balance=0, used=0), "custom_rate_limit", retry_after
+                )
+        if not self._rate_limiter.check(key_id):
+            return Admission(UsageState(balance=0, used=0), "rate_limit")
+        return None
+
+    def _take(
+        self,
+        key_id: str,
+        tag: Optional[str],
+        windows: Sequence[tuple[int, float]],
+        lease_limit: int,
+    ) -> None:
+        if windows:
+            self._custom_limiter.allow(f"{key_id}:{tag}", windows)
+        self._rate_limiter.allow(key_id)
+        if lease_limit > 0:
+            self._leases.acquire(key_id, lease_limit)
+
+    async def authorize(
+        self,
+        key_id: str,
+        *,
+        tag: Optional[str] = None,
+        windows: Sequence[tuple[int, float]] = (),
+        lease_limit: int = 0,
+    ) -> Admission:
+        rejected = self._check(key_id, tag, windows)
+        if rejected is not None:
+            return rejected
+        usage_state = self._usage_tracker.get_state(key_id)
+        if usage_state.balance <= 0:
+            return Admission(usage_state, "quota")
+        if lease_limit > 0 and not self._leases.check(key_id, lease_limit):
+            return Admission(usage_state, "concurrency")
+        self._take(key_id, tag, windows, lease_limit)
+        return Admission(usage_state)
+
+    async def admit(self, key_id: str, *, release_leases: int = 0) -> bool:
+        if release_leases > 0:
+            self._leases.release(key_id, release_leases)
+        return self._rate_limiter.allow(key_id)
+
+    async def report(
+        self,
+        key_id: str,
+        tokens: int,
+        idempotency_key: Optional[str] = None,
+        *,
+        release_leases: int = 0,
+    ) -> tuple[bool, UsageState, bool, bool]:
+        # No await between the replay lookup and the store, so a duplicate arriving
+        # concurrently on this event loop cannot slip between them.
+        replay_key = f"{key_id}:{idempotency_key}" if idempotency_key is not None else None
+        if replay_key is not None:
+            replay = self._replays.get(replay_key)
+            if replay is not None:
+                return True, replay[0], replay[1], True
+        if release_leases > 0:
+            self._leases.release(key_id, release_leases)
+        if not self._rate_limiter.allow(key_id):
+            return False, UsageState(balance=0, used=0), False, False
+        usage_state, out_of_quota = self._usage_tracker.consume(key_id, tokens)
+        if replay_key is not None:
+            self._replays.put(replay_key, (usage_state, out_of_quota))
+        return True, usage_state, out_of_quota, False
+
+    async def charge(self, key_id: str, tokens: int) -> tuple[UsageState, bool]:
+        return self._usage_tracker.consume(key_id, tokens)
+
+    async def release_lease(self, key_id: str, count: int = 1) -> None:
+        self._leases.release(key_id, count)
+
+    async def reserve(
+        self,
+        key_id: str,
+        amount: int,
+        ttl_seconds: int,
+        *,
+        tag: Optional[str] = None,
+        windows: Sequence[tuple[int, float]] = (),
+        lease_limit: int = 0,
+    ) -> tuple[Admission, Optional[str], float]:
+        rejected = self._check(key_id, tag, windows)
+        if rejected is not None:
+            return rejected, None, 0.0
+        if lease_limit > 0 and not self._leases.check(key_id, lease_limit):
+            return Admission(UsageState(balance=0, used=0), "concurrency"), None, 0.0
+        usage_state, held = self._usage_tracker.hold(key_id, amount)
+        if not held:
+            return Admission(usage_state, "quota"), None, 0.0
+        self._take(key_id, tag, windows, lease_limit)
+        reservation_id, expires_at = self._reservations.add(key_id, amount, ttl_seconds)
+        return Admission(usage_state), reservation_id, expires_at
+
+    async def settle(
+        self, key_id: str, reservation_id: str, tokens: int, *, release_leases: int = 0
+    ) -> tuple[UsageState, bool, bool]:
+        # A retried settle returns the first result; an unknown reservation would
+        # otherwise be charged again in full.
+        settle_key = f"{key_id}:{reservation_id}"
+        settled = self._settlements.get(settle_key)
+        if settled is not None:
+            return settled[0], settled[1], True
+        held = self._reservations.take(reservation_id, key_id)
+        usage_state, out_of_quota = self._usage_tracker.settle(key_id, held, tokens)
+        self._settlements.put(settle_key, (usage_state, out_of_quota))
+        if release_leases > 0:
+            self._leases.release(key_id, release_leases)
+        return usage_state, out_of_quota, False
+
+    async def sweep(self) -> int:
+        expired = self._reservations.expire()
+        for hold in expired:
+            self._usage_tracker.release(hold.key_id, hold.amount)
+        return len(expired)
+
+    async def close(self) -> None:
+        pass
+
+
+# Shared Lua prelude. The limiter is a sliding-window counter: the previous minute's count
+# weighted by its remaining overlap plus the current count, kept as fields of one hash.
+# Holds are "amount:expires_at" fields of a per-key hash; whichever script deletes a
+# field returns its amount to the wallet. Leases are sorted-set members scored by expiry.
+# Custom limits keep one GCRA cell per window in a hash, as "micros:remainder:occurrence":
+# the arrival time in whole microseconds plus remainder / occurrence, so intervals sum
+# exactly without scaling the clock past what a Lua double holds. Checks and takes are
+# separate functions so a script can run every check before it charges anything. Every
+# key of one wallet shares the {key_id} hash tag so each script stays on one cluster slot.
+_LUA_PRELUDE = """
+local function clock()
+  local t = redis.call('TIME')
+  return tonumber(t[1]) + tonumber(t[2]) / 1000000
+end
+
+local function rate_check(key, limit, now)
+  if limit <= 0 then
+    return true
+  end
+  local window = math.floor(now / 60)
+  local elapsed = (now - window * 60) / 60
+  local current = tonumber(redis.call('HGET', key, tostring(window)) or '0')
+  local previous = tonumber(redis.call('HGET', key, tostring(window - 1)) or '0')
+  return previous * (1 - elapsed) + current < limit
+end
+
+local function rate_take(key, limit, now)
+  if limit <= 0 then
+    return
+  end
+  local window = math.floor(now / 60)
+  redis.call('HINCRBY', key, tostring(window), 1)
+  redis.call('HDEL', key, tostring(window - 2))
+  redis.call('EXPIRE', key, 180)
+end
+
+local function admit(key, limit, now)
+  if not rate_check(key, limit, now) then
+    return false
+  end
+  rate_take(key, limit, now)
+  return true
+end
+
+-- ARGV[first] is the window count, followed by (occurrence, period seconds) pairs;
+-- occurrence 0 blocks, negative skips. Returns the wait in microseconds, the updated
+-- cells and the longest period.
+local function windows_check(key, first)
+  local count = tonumber(ARGV[first])
+  local updated = {}
+  local wait = 0
+  local horizon = 0
+  if count == 0 then
+    return wait, updated, horizon
+  end
+  local t = redis.call('TIME')
+  local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+  for i = 1, count do
+    local occurrence = tonumber(ARGV[first + 2 * i - 1])
+    local period = tonumber(ARGV[first + 2 * i])
+    local cell = redis.call('HGET', key, tostring(i)) or '0:0:0'
+    local period_us = math.floor(period * 1000000 + 0.5)
+    if occurrence == 0 then
+      wait = math.max(wait, period_us)
+    elseif occurrence < 0 then
+      updated[i] = cell
+    else
+      local tat, remainder, scale = string.match(cell, '^(%d+):(%d+):(%d+)$')
+      tat, remainder = tonumber(tat) or 0, tonumber(remainder) or 0
+      if (tonumber(scale) or 0) ~= occurrence and remainder > 0 then
+        tat, remainder = tat + 1, 0
+      end
+      if tat < now then
+        tat, remainder = now, 0
+      end
+      remainder = remainder + period_us
+      tat = tat + math.floor(remainder / occurrence)
+      remainder = remainder % occurrence
+      local over = tat - period_us - now
+      if over > 0 or (over == 0 and remainder > 0) then
+        wait = math.max(wait, over + remainder / occurrence)
+      end
+      updated[i] = string.format('%d:%d:%d', tat, remainder, occurrence)
+    end
+    horizon = math.max(horizon, period)
+  end
+  return wait, updated, horizon
+end
+
+local function windows_take(key, updated, horizon)
+  if #updated == 0 then
+    return
+  end
+  for i = 1, #updated do
+    redis.call('HSET', key, tostring(i), updated[i])
+  end
+  redis.call('EXPIRE', key, math.ceil(horizon) + 1)
+end
+
+local function leases_check(key, limit, now)
+  if limit <= 0 then
+    return true
+  end
+  redis.call('ZREMRANGEBYSCORE', key, '-inf', now)
+  return redis.call('ZCARD', key) < limit
+end
+
+local function leases_take(key, limit, ttl, id, now)
+  if limit <= 0 then
+    return
+  end
+  redis.call('ZADD', key, now + ttl, id)
+  redis.call('EXPIRE', key, math.ceil(ttl) + 1)
+end
+
+-- Retires the oldest live leases.
+local function leases_release(key, count, now)
+  if count <= 0 then
+    return
+  end
+  redis.call('ZREMRANGEBYSCORE', key, '-inf', now)
+  redis.call('ZPOPMIN', key, count)
+end
+
+local function load_wallet(key, default_balance)
+  local wallet = redis.call('HMGET', key, 'balance', 'used')
+  return tonumber(wallet[1] or default_balance), tonumber(wallet[2] or '0')
+end
+
+local function debit(balance, used, tokens)
+  local out_of_quota = 0
+  if balance <= 0 or tokens > balance then
+    out_of_quota = 1
+  end
+  if tokens > 0 then
+    balance = math.max(balance - tokens, 0)
+    used = used + tokens
+  end
+  return balance, used, out_of_quota
+end
+
+local function hold_amount(hold)
+  return tonumber(string.sub(hold, 1, string.find(hold, ':', 1, true) - 1))
+end
+
+local function release_expired(wallet, holds, now)
+  local entries = redis.call('HGETALL', holds)
+  local refund = 0
+  local released = 0
+  for i = 1, #entries, 2 do
+    local hold = entries[i + 1]
+    local expires_at = tonumber(string.sub(hold, string.find(hold, ':', 1, true) + 1))
+    if expires_at <= now then
+      redis.call('HDEL', holds, entries[i])
+      refund = refund + hold_amount(hold)
+      released = released + 1
+    end
+  end
+  if refund > 0 then
+    redis.call('HINCRBY', wallet, 'balance', refund)
+  end
+  return released
+end
+"""
+
+# KEYS: wallet, limiter, leases, custom limiter hash (only with windows). ARGV: limit per
+# minute (0 = unlimited), default balance, lease limit (0 = no lease), lease TTL seconds,
+# lease id, then the custom windows. Returns {rejected, balance, used, retry_after} with
+# rejected '' once every check has passed and the request is charged.
+_AUTHORIZE_SCRIPT = _LUA_PRELUDE + """
+local now = clock()
+local wait, updated, horizon = windows_check(KEYS[4], 6)
+if wait > 0 then
+  return {'custom_rate_limit', 0, 0, tostring(wait / 1000000)}
+end
+local limit = tonumber(ARGV[1])
+if not rate_check(KEYS[2], limit, now) then
+  return {'rate_limit', 0, 0, '0'}
+end
+local balance, used = load_wallet(KEYS[1], ARGV[2])
+if balance <= 0 then
+  return {'quota', balance, used, '0'}
+end
+local lease_limit = tonumber(ARGV[3])
+if not leases_check(KEYS[3], lease_limit, now) then
+  return {'concurrency', balance, used, '0'}
+end
+windows_take(KEYS[4], updated, horizon)
+rate_take(KEYS[2], limit, now)
+leases_take(KEYS[3], lease_limit, tonumber(ARGV[4]), ARGV[5], now)
+return {'', balance, used, '0'}
+"""
+
+# KEYS: wallet, limiter, leases, optional idempotency record. ARGV: limit per minute
+# (0 = unlimited), default balance, tokens (-1 = admission only), idempotency TTL
+# seconds, leases to release. A replay releases nothing: its lease went back with the
+# first delivery. Returns {allowed, balance, used, out_of_quota, replayed}.
+_QUOTA_SCRIPT = _LUA_PRELUDE + """
+if KEYS[4] then
+  local replay = redis.call('GET', KEYS[4])
+  if replay then
+    local result = {}
+    for field in string.gmatch(replay, '[^:]+') do
+      result[#result + 1] = tonumber(field)
+    end
+    result[5] = 1
+    return result
+  end
+end
+local now = clock()
+leases_release(KEYS[3], tonumber(ARGV[5]), now)
+if not admit(KEYS[2], tonumber(ARGV[1]), now) then
+  return {0, 0, 0, 0, 0}
+end
+local tokens = tonumber(ARGV[3])
+local balance, used = load_wallet(KEYS[1], ARGV[2])
+if tokens < 0 then
+  return {1, balance, used, 0, 0}
+end
+local out_of_quota
+balance, used, out_of_quota = debit(balance, used, tokens)
+if tokens > 0 then
+  redis.call('HSET', KEYS[1], 'balance', balance, 'used', used)
+end
+local result = {1, balance, used, out_of_quota}
+if KEYS[4] then
+  redis.call('SET', KEYS[4], table.concat(result, ':'), 'EX', ARGV[4])
+end
+result[5] = 0
+return result
+"""
+
+# KEYS: lease set. ARGV: count.
+_RELEASE_SCRIPT = _LUA_PRELUDE + """
+leases_release(KEYS[1], tonumber(ARGV[1]), clock())
+return 1
+"""
+
+# KEYS: wallet, limiter, holds, leases, custom limiter hash (only with windows). ARGV:
+# limit per minute, default balance, amount, reservation id, ttl seconds, lease limit,
+# lease TTL seconds, lease id, then the custom windows. Returns {rejected, balance, used,
+# expires_at, retry_after} with rejected '' once the hold is placed.
+_RESERVE_SCRIPT = _LUA_PRELUDE + """
+local now = clock()
+local wait, updated, horizon = windows_check(KEYS[5], 9)
+if wait > 0 then
+  return {'custom_rate_limit', 0, 0, '', tostring(wait / 1000000)}
+end
+local limit = tonumber(ARGV[1])
+if not rate_check(KEYS[2], limit, now) then
+  return {'rate_limit', 0, 0, '', '0'}
+end
+local lease_limit = tonumber(ARGV[6])
+if not leases_check(KEYS[4], lease_limit, now) then
+  return {'concurrency', 0, 0, '', '0'}
+end
+release_expired(KEYS[1], KEYS[3], now)
+local balance, used = load_wallet(KEYS[1], ARGV[2])
+local amount = tonumber(ARGV[3])
+if balance <= 0 or amount > balance then
+  return {'quota', balance, used, '', '0'}
+end
+balance = balance - amount
+redis.call('HSET', KEYS[1], 'balance', balance, 'used', used)
+local expires_at = string.format('%.3f', now + tonumber(ARGV[5]))
+redis.call('HSET', KEYS[3], ARGV[4], ARGV[3] .. ':' .. expires_at)
+windows_take(KEYS[5], updated, horizon)
+rate_take(KEYS[2], limit, now)
+leases_take(KEYS[4], lease_limit, tonumber(ARGV[7]), ARGV[8], now)
+return {'', balance, used, expires_at, '0'}
+"""
+
+# KEYS: wallet, holds, settle record, leases. ARGV: default balance, reservation id,
+# tokens, record TTL seconds, leases to release. Returns {balance, used, out_of_quota,
+# replayed}.
+_SETTLE_SCRIPT = _LUA_PRELUDE + """
+local settled = redis.call('GET', KEYS[3])
+if settled then
+  local result = {}
+  for field in string.gmatch(settled, '[^:]+') do
+    result[#result + 1] = tonumber(field)
+  end
+  result[4] = 1
+  return result
+end
+local balance, used = load_wallet(KEYS[1], ARGV[1])
+local hold = redis.call('HGET', KEYS[2], ARGV[2])
+if hold then
+  redis.call('HDEL', KEYS[2], ARGV[2])
+  balance = balance + hold_amount(hold)
+end
+local out_of_quota
+balance, used, out_of_quota = debit(balance, used, tonumber(ARGV[3]))
+redis.call('HSET', KEYS[1], 'balance', balance, 'used', used)
+local result = {balance, used, out_of_quota}
+redis.call('SET', KEYS[3], table.concat(result, ':'), 'EX', ARGV[4])
+leases_release(KEYS[4], tonumber(ARGV[5]), clock())
+result[4] = 0
+return result
+"""
+
+# KEYS: wallet, holds. ARGV: reservation ids due per the hold index. Releases every
+# expired hold of the wallet. Returns {released, ids whose hold is gone...}.
+_SWEEP_SCRIPT = _LUA_PRELUDE + """
+local result = {release_expired(KEYS[1], KEYS[2], clock())}
+for i = 1, #ARGV do
+  if redis.call('HEXISTS', KEYS[2], ARGV[i]) == 0 then
+    result[#result + 1] = ARGV[i]
+  end
+end
+return result
+"""
+
+_SWEEP_BATCH = 1000
+
+
+def _window_args(windows: Sequence[tuple[int, float]]) -> list:
+    args: list = [len(windows)]
+    for occurrence, period in windows:
+        args.extend((occurrence, period))
+    return args
+
+
+class RedisStateBackend:
+    def __init__(
+        self,
+        client: Redis,
+        *,
+        key_prefix: str,
+        default_balance: int,
+        limit_per_minute: int,
+        idempotency_ttl_seconds: int,
+        lease_ttl_seconds: int,
+    ) -> None:
+        self._client = client
+        self._key_prefix = key_prefix
+        self._default_balance = default_balance
+        self._limit = limit_per_minute
+        self._idempotency_ttl = idempotency_ttl_seconds
+        self._lease_ttl = lease_ttl_seconds
+        # Holds by expiry, as "key_id:reservation_id" members. It spans wallets, so it sits
+        # outside the {key_id} slots and is written next to the scripts rather than by them.
+        self._hold_index = f"{key_prefix}:hold-expiry"
+        self._authorize = client.register_script(_AUTHORIZE_SCRIPT)
+        self._quota = client.register_script(_QUOTA_SCRIPT)
+        self._reserve = client.register_script(_RESERVE_SCRIPT)
+        self._settle = client.register_script(_SETTLE_SCRIPT)
+        self._sweep = client.register_script(_SWEEP_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    @classmethod
+    def from_url(
+        cls,
+        url: str,
+        *,
+        max_connections: int,
+        key_prefix: str,
+        default_balance: int,
+        limit_per_minute: int,
+        idempotency_ttl_seconds: int,
+        lease_ttl_seconds: int,
+    ) -> "RedisStateBackend":
+        pool = BlockingConnectionPool.from_url(url, max_connections=max_connections, timeout=5)
+        client = Redis(connection_pool=pool)
+        return cls(
+            client,
+            key_prefix=key_prefix,
+            default_balance=default_balance,
+            limit_per_minute=limit_per_minute,
+            idempotency_ttl_seconds=idempotency_ttl_seconds,
+            lease_ttl_seconds=lease_ttl_seconds,
+        )
+
+    def _key(self, key_id: str, suffix: str) -> str:
+        return f"{self._key_prefix}:{{{key_id}}}:{suffix}"
+
+    async def _call(
+        self,
+        script: AsyncScript,
+        key_id: str,
+        keys: list,
+        args: list,
+        index: Optional[Callable[[Pipeline], object]] = None,
+    ) -> list:
+        # index queues hold-index writes into the same round trip as the script.
+        try:
+            if index is None:
+                return await script(keys=keys, args=args)
+            async with self._client.pipeline(transaction=False) as pipe:
+                await script(keys=keys, args=args, client=pipe)
+                index(pipe)
+                return (await pipe.execute())[0]
+        except RedisError as exc:
+            logger.exception("Shared state call failed", extra={"key_id": key_id})
+            raise RuntimeError("Shared state call failed") from exc
+
+    def _admission_keys(
+        self, key_id: str, tag: Optional[str], windows: Sequence[tuple[int, float]]
+    ) -> list:
+        return [self._key(key_id, f"crl:{tag}")] if windows else []
+
+    async def _run(
+        self,
+        key_id: str,
+        tokens: int,
+        limit: int,
+        idempotency_key: Optional[str] = None,
+        release_leases: int = 0,
+    ) -> tuple[bool, UsageState, bool, bool]:
+        keys = [
+            self._key(key_id, "wallet"),
+            self._key(key_id, "rl"),
+            self._key(key_id, "leases"),
+        ]
+        if idempotency_key is not None:
+            keys.append(self._key(key_id, f"idem:{idempotency_key}"))
+        allowed, balance, used, out_of_quota, replayed = await self._call(
+            self._quota,
+            key_id,
+            keys,
+            [limit, self._default_balance, tokens, self._idempotency_ttl, release_leases],
+        )
+        return (
+            bool(allowed),
+            UsageState(balance=int(balance), used=int(used)),
+            bool(out_of_quota),
+            bool(replayed),
+        )
+
+    async def authorize(
+        self,
+        key_id: str,
+        *,
+        tag: Optional[str] = None,
+        windows: Sequence[tuple[int, float]] = (),
+        lease_limit: int = 0,
+    ) -> Admission:
+        rejected, balance, used, retry_after = await self._call(
+            self._authorize,
+            key_id,
+            [
+                self._key(key_id, "wallet"),
+                self._key(key_id, "rl"),
+                self._key(key_id, "leases"),
+                *self._admission_keys(key_id, tag, windows),
+            ],
+            [
+                self._limit,
+                self._default_balance,
+                lease_limit,
+                self._lease_ttl,
+                secrets.token_hex(8),
+                *_window_args(windows),
+            ],
+        )
+        return Admission(
+            UsageState(balance=int(balance), used=int(used)),
+            rejected.decode() or None,
+            float(retry_after),
+        )
+
+    async def admit(self, key_id: str, *, release_leases: int = 0) -> bool:
+        allowed, _, _, _ = await self._run(
+            key_id, -1, self._limit, release_leases=release_leases
+        )
+        return allowed
+
+    async def report(
+        self,
+        key_id: str,
+        tokens: int,
+        idempotency_key: Optional[str] = None,
+        *,
+        release_leases: int = 0,
+    ) -> tuple[bool, UsageState, bool, bool]:
+        return await self._run(key_id, tokens, self._limit, idempotency_key, release_leases)
+
+    async def charge(self, key_id: str, tokens: int) -> tuple[UsageState, bool]:
+        _, usage_state, out_of_quota, _ = await self._run(key_id, tokens, 0)
+        return usage_state, out_of_quota
+
+    async def release_lease(self, key_id: str, count: int = 1) -> None:
+        await self._call(self._release, key_id, [self._key(key_id, "leases")], [count])
+
+    async def reserve(
+        self,
+        key_id: str,
+        amount: int,
+        ttl_seconds: int,
+        *,
+        tag: Optional[str] = None,
+        windows: Sequence[tuple[int, float]] = (),
+        lease_limit: int = 0,
+    ) -> tuple[Admission, Optional[str], float]:
+        reservation_id = secrets.token_urlsafe(12)
+        member = {f"{key_id}:{reservation_id}": time.time() + ttl_seconds}
+        # Indexed even if the hold is refused; the sweep drops entries without one.
+        rejected, balance, used, expires_at, retry_after = await self._call(
+            self._reserve,
+            key_id,
+            [
+                self._key(key_id, "wallet"),
+                self._key(key_id, "rl"),
+                self._key(key_id, "holds"),
+                self._key(key_id, "leases"),
+                *self._admission_keys(key_id, tag, windows),
+            ],
+            [
+                self._limit,
+                self._default_balance,
+                amount,
+                reservation_id,
+                ttl_seconds,
+                lease_limit,
+                self._lease_ttl,
+                secrets.token_hex(8),
+                *_window_args(windows),
+            ],
+            lambda pipe: pipe.zadd(self._hold_index, member),
+        )
+        admission = Admission(
+            UsageState(balance=int(balance), used=int(used)),
+            rejected.decode() or None,
+            float(retry_after),
+        )
+        if admission.rejected is not None:
+            return admission, None, 0.0
+        return admission, reservation_id, float(expires_at)
+
+    async def settle(
+        self, key_id: str, reservation_id: str, tokens: int, *, release_leases: int = 0
+    ) -> tuple[UsageState, bool, bool]:
+        balance, used, out_of_quota, replayed = await self._call(
+            self._settle,
+            key_id,
+            [
+                self._key(key_id, "wallet"),
+                self._key(key_id, "holds"),
+                self._key(key_id, f"settled:{reservation_id}"),
+                self._key(key_id, "leases"),
+            ],
+            [
+                self._default_balance,
+                reservation_id,
+                tokens,
+                self._idempotency_ttl,
+                release_leases,
+            ],
+            lambda pipe: pipe.zrem(self._hold_index, f"{key_id}:{reservation_id}"),
+        )
+        return (
+            UsageState(balance=int(balance), used=int(used)),
+            bool(out_of_quota),
+            bool(replayed),
+        )
+
+    async def sweep(self) -> int:
+        # Every replica may sweep; each release is a single atomic script per wallet. The
+        # index is scored by the replica clock, so an entry is only dropped once the
+        # wallet's script no longer finds its hold.
+        released = 0
+        try:
+            while True:
+                due = await self._client.zrangebyscore(
+                    self._hold_index, "-inf", time.time(), start=0, num=_SWEEP_BATCH
+                )
+                wallets: dict[str, list[str]] = {}
+                for member in due:
+                    key_id, _, reservation_id = member.decode().rpartition(":")
+                    wallets.setdefault(key_id, []).append(reservation_id)
+                gone: list[str] = []
+                for key_id, reservation_ids in wallets.items():
+                    count, *settled = await self._sweep(
+                        keys=[self._key(key_id, "wallet"), self._key(key_id, "holds")],
+                        args=reservation_ids,
+                    )
+                    released += count
+                    gone.extend(f"{key_id}:{rid.decode()}" for rid in settled)
+                if gone:
+                    await self._client.zrem(self._hold_index, *gone)
+                if len(due) < _SWEEP_BATCH or not gone:
+                    break
+        except RedisError as exc:
+            logger.exception("Shared state sweep failed")
+            raise RuntimeError("Shared state sweep failed") from exc
+        return released
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+__all__ = ["LocalStateBackend", "RedisStateBackend", "StateBackend"]
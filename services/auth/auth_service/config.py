@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import re
-from typing import Annotated
+from dataclasses import dataclass
+from typing import Literal
 
-from pydantic import AliasChoices, BaseModel, Field, field_validator
+from pydantic import AliasChoices, Field, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 PREFIX_RE = re.compile(r"^[a-zA-Z0-9-]{3,32}$")
@@ -28,14 +29,170 @@ class Settings(BaseSettings):
         default=300,
         validation_alias=AliasChoices("API_KEY_CACHE_TTL_SECONDS"),
     )
+    api_key_cache_stale_seconds: int = Field(
+        default=0,
+        validation_alias=AliasChoices("API_KEY_CACHE_STALE_SECONDS"),
+    )
+    api_key_cache_max_entries: int = Field(
+        default=10_000,
+        validation_alias=AliasChoices("API_KEY_CACHE_MAX_ENTRIES"),
+    )
+    api_key_negative_cache_ttl_seconds: int = Field(
+        default=60,
+        validation_alias=AliasChoices("API_KEY_NEGATIVE_CACHE_TTL_SECONDS"),
+    )
+    api_key_negative_cache_max_entries: int = Field(
+        default=10_000,
+        validation_alias=AliasChoices("API_KEY_NEGATIVE_CACHE_MAX_ENTRIES"),
+    )
+    response_cache_max_entries: int = Field(
+        default=10_000,
+        validation_alias=AliasChoices("RESPONSE_CACHE_MAX_ENTRIES"),
+    )
+    api_key_cache_prewarm: bool = Field(
+        default=False,
+        validation_alias=AliasChoices("API_KEY_CACHE_PREWARM"),
+    )
+    api_key_cache_prewarm_concurrency: int = Field(
+        default=16,
+        validation_alias=AliasChoices("API_KEY_CACHE_PREWARM_CONCURRENCY"),
+    )
+    api_key_cache_prewarm_timeout_seconds: float = Field(
+        default=30.0,
+        validation_alias=AliasChoices("API_KEY_CACHE_PREWARM_TIMEOUT_SECONDS"),
+    )
+    key_vault_sync_interval_seconds: int = Field(
+        default=0,
+        validation_alias=AliasChoices("KEY_VAULT_SYNC_INTERVAL_SECONDS"),
+    )
+    key_vault_max_connections: int = Field(
+        default=100,
+        validation_alias=AliasChoices("KEY_VAULT_MAX_CONNECTIONS"),
+    )
+    key_vault_outage_grace_seconds: int = Field(
+        default=0,
+        validation_alias=AliasChoices("KEY_VAULT_OUTAGE_GRACE_SECONDS"),
+    )
+    auth_snapshot_path: str | None = Field(
+        default=None,
+        validation_alias=AliasChoices("AUTH_SNAPSHOT_PATH"),
+    )
+    auth_snapshot_key: str | None = Field(
+        default=None,
+        validation_alias=AliasChoices("AUTH_SNAPSHOT_KEY"),
+    )
+    auth_snapshot_interval_seconds: int = Field(
+        default=60,
+        validation_alias=AliasChoices("AUTH_SNAPSHOT_INTERVAL_SECONDS"),
+    )
     default_wallet_balance: int = Field(
         default=1_000_000,
         validation_alias=AliasChoices("DEFAULT_WALLET_BALANCE"),
     )
+    state_backend: Literal["memory", "redis"] = Field(
+        default="memory",
+        validation_alias=AliasChoices("STATE_BACKEND"),
+    )
+    redis_url: str | None = Field(
+        default=None,
+        validation_alias=AliasChoices("REDIS_URL"),
+    )
+    redis_key_prefix: str = Field(
+        default="azjina-auth",
+        validation_alias=AliasChoices("REDIS_KEY_PREFIX"),
+    )
+    redis_max_connections: int = Field(
+        default=50,
+        validation_alias=AliasChoices("REDIS_MAX_CONNECTIONS"),
+    )
+    usage_log_dir: str | None = Field(
+        default=None,
+        validation_alias=AliasChoices("USAGE_LOG_DIR"),
+    )
+    usage_log_flush_interval_ms: int = Field(
+        default=5,
+        validation_alias=AliasChoices("USAGE_LOG_FLUSH_INTERVAL_MS"),
+    )
+    usage_snapshot_interval_seconds: int = Field(
+        default=300,
+        validation_alias=AliasChoices("USAGE_SNAPSHOT_INTERVAL_SECONDS"),
+    )
+    usage_ingest_mode: Literal["sync", "async"] = Field(
+        default="sync",
+        validation_alias=AliasChoices("USAGE_INGEST_MODE"),
+    )
+    usage_ingest_queue_size: int = Field(
+        default=10_000,
+        validation_alias=AliasChoices("USAGE_INGEST_QUEUE_SIZE"),
+    )
+    usage_ingest_flush_interval_ms: int = Field(
+        default=50,
+        validation_alias=AliasChoices("USAGE_INGEST_FLUSH_INTERVAL_MS"),
+    )
+    quota_reservation_ttl_seconds: int = Field(
+        default=300,
+        validation_alias=AliasChoices("QUOTA_RESERVATION_TTL_SECONDS"),
+    )
+    quota_reservation_sweep_interval_seconds: int = Field(
+        default=5,
+        validation_alias=AliasChoices("QUOTA_RESERVATION_SWEEP_INTERVAL_SECONDS"),
+    )
+    usage_idempotency_ttl_seconds: int = Field(
+        default=3600,
+        validation_alias=AliasChoices("USAGE_IDEMPOTENCY_TTL_SECONDS"),
+    )
+    usage_idempotency_max_entries: int = Field(
+        default=100_000,
+        validation_alias=AliasChoices("USAGE_IDEMPOTENCY_MAX_ENTRIES"),
+    )
+    usage_batch_max_items: int = Field(
+        default=1000,
+        validation_alias=AliasChoices("USAGE_BATCH_MAX_ITEMS"),
+    )
+    concurrency_limit: int = Field(
+        default=0,
+        validation_alias=AliasChoices("CONCURRENCY_LIMIT"),
+    )
+    concurrency_lease_ttl_seconds: int = Field(
+        default=300,
+        validation_alias=AliasChoices("CONCURRENCY_LEASE_TTL_SECONDS"),
+    )
+    concurrency_retry_after_seconds: int = Field(
+        default=1,
+        validation_alias=AliasChoices("CONCURRENCY_RETRY_AFTER_SECONDS"),
+    )
+    server_timing_sample_rate: float = Field(
+        default=0.0,
+        validation_alias=AliasChoices("SERVER_TIMING_SAMPLE_RATE"),
+    )
+    tracing_exporter: Literal["none", "otlp", "file", "memory"] = Field(
+        default="none",
+        validation_alias=AliasChoices("TRACING_EXPORTER"),
+    )
+    tracing_file_path: str | None = Field(
+        default=None,
+        validation_alias=AliasChoices("TRACING_FILE_PATH"),
+    )
+    tracing_service_name: str = Field(
+        default="az-jina-auth",
+        validation_alias=AliasChoices("TRACING_SERVICE_NAME", "OTEL_SERVICE_NAME"),
+    )
     rate_limit_per_minute: int = Field(
         default=0,
         validation_alias=AliasChoices("RATE_LIMIT_PER_MINUTE"),
     )
+    rate_limiter_engine: Literal["window", "gcra"] = Field(
+        default="window",
+        validation_alias=AliasChoices("RATE_LIMITER_ENGINE"),
+    )
+    state_shards: int = Field(
+        default=1,
+        validation_alias=AliasChoices("STATE_SHARDS"),
+    )
+    state_janitor_interval_seconds: int = Field(
+        default=60,
+        validation_alias=AliasChoices("STATE_JANITOR_INTERVAL_SECONDS"),
+    )
     managed_identity_client_id: str | None = Field(
         default=None,
         validation_alias=AliasChoices("AZURE_CLIENT_ID"),
@@ -43,6 +200,18 @@ class Settings(BaseSettings):
     host: str = Field(default="0.0.0.0", validation_alias=AliasChoices("HOST"))
     port: int = Field(default=8080, validation_alias=AliasChoices("PORT"))
     log_level: str = Field(default="INFO", validation_alias=AliasChoices("LOG_LEVEL"))
+    log_format: Literal["text", "json"] = Field(
+        default="text",
+        validation_alias=AliasChoices("LOG_FORMAT"),
+    )
+    log_queue: bool = Field(
+        default=False,
+        validation_alias=AliasChoices("LOG_QUEUE"),
+    )
+    access_log_sample_rate: float = Field(
+        default=1.0,
+        validation_alias=AliasChoices("ACCESS_LOG_SAMPLE_RATE"),
+    )
 
     @field_validator("auth_dashboard_api_key")
     @classmethod
@@ -75,6 +244,122 @@ class Settings(BaseSettings):
             raise ValueError("API_KEY_CACHE_TTL_SECONDS must be >= 0.")
         return value
 
+    @field_validator("api_key_cache_stale_seconds")
+    @classmethod
+    def _validate_cache_stale(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("API_KEY_CACHE_STALE_SECONDS must be >= 0.")
+        return value
+
+    @field_validator("api_key_cache_max_entries")
+    @classmethod
+    def _validate_cache_max_entries(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("API_KEY_CACHE_MAX_ENTRIES must be >= 1.")
+        return value
+
+    @field_validator("api_key_negative_cache_ttl_seconds")
+    @classmethod
+    def _validate_negative_cache_ttl(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("API_KEY_NEGATIVE_CACHE_TTL_SECONDS must be >= 0.")
+        return value
+
+    @field_validator("response_cache_max_entries")
+    @classmethod
+    def _validate_response_cache_max_entries(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("RESPONSE_CACHE_MAX_ENTRIES must be >= 0.")
+        return value
+
+    @field_validator("api_key_negative_cache_max_entries")
+    @classmethod
+    def _validate_negative_cache_max_entries(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("API_KEY_NEGATIVE_CACHE_MAX_ENTRIES must be >= 0.")
+        return value
+
+    @field_validator("api_key_cache_prewarm_concurrency")
+    @classmethod
+    def _validate_prewarm_concurrency(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("API_KEY_CACHE_PREWARM_CONCURRENCY must be >= 1.")
+        return value
+
+    @field_validator("api_key_cache_prewarm_timeout_seconds")
+    @classmethod
+    def _validate_prewarm_timeout(cls, value: float) -> float:
+        if value <= 0:
+            raise ValueError("API_KEY_CACHE_PREWARM_TIMEOUT_SECONDS must be > 0.")
+        return value
+
+    @field_validator("key_vault_sync_interval_seconds")
+    @classmethod
+    def _validate_sync_interval(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("KEY_VAULT_SYNC_INTERVAL_SECONDS must be >= 0.")
+        return value
+
+    @field_validator("key_vault_max_connections")
+    @classmethod
+    def _validate_max_connections(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("KEY_VAULT_MAX_CONNECTIONS must be >= 1.")
+        return value
+
+    @field_validator("key_vault_outage_grace_seconds")
+    @classmethod
+    def _validate_outage_grace(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("KEY_VAULT_OUTAGE_GRACE_SECONDS must be >= 0.")
+        return value
+
+    @field_validator("auth_snapshot_interval_seconds")
+    @classmethod
+    def _validate_snapshot_interval(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("AUTH_SNAPSHOT_INTERVAL_SECONDS must be >= 1.")
+        return value
+
+    @field_validator("state_shards")
+    @classmethod
+    def _validate_state_shards(cls, value: int) -> int:
+        if value < 1 or value > 1024:
+            raise ValueError("STATE_SHARDS must be between 1 and 1024.")
+        return value
+
+    @field_validator("state_janitor_interval_seconds")
+    @classmethod
+    def _validate_janitor_interval(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("STATE_JANITOR_INTERVAL_SECONDS must be >= 0.")
+        return value
+
+    @field_validator("redis_max_connections")
+    @classmethod
+    def _validate_redis_max_connections(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("REDIS_MAX_CONNECTIONS must be >= 1.")
+        return value
+
+    @model_validator(mode="after")
+    def _validate_snapshot(self) -> "Settings":
+        if self.auth_snapshot_path and not self.auth_snapshot_key:
+            raise ValueError("AUTH_SNAPSHOT_KEY is required when AUTH_SNAPSHOT_PATH is set.")
+        return self
+
+    @model_validator(mode="after")
+    def _validate_state_backend(self) -> "Settings":
+        if self.state_backend == "redis" and not self.redis_url:
+            raise ValueError("REDIS_URL is required when STATE_BACKEND=redis.")
+        return self
+
+    @model_validator(mode="after")
+    def _validate_tracing(self) -> "Settings":
+        if self.tracing_exporter == "file" and not self.tracing_file_path:
+            raise ValueError("TRACING_FILE_PATH is required when TRACING_EXPORTER=file.")
+        return self
+
     @field_validator("default_wallet_balance")
     @classmethod
     def _validate_wallet_balance(cls, value: int) -> int:
@@ -82,42 +367,117 @@ class Settings(BaseSettings):
             raise ValueError("DEFAULT_WALLET_BALANCE must be >= 0.")
         return value
 
-    @field_validator("rate_limit_per_minute")
+    @field_validator("usage_log_flush_interval_ms")
     @classmethod
-    def _validate_rate_limit(cls, value: int) -> int:
+    def _validate_usage_flush_interval(cls, value: int) -> int:
         if value < 0:
-            raise ValueError("RATE_LIMIT_PER_MINUTE must be >= 0.")
+            raise ValueError("USAGE_LOG_FLUSH_INTERVAL_MS must be >= 0.")
         return value
 
+    @field_validator("usage_snapshot_interval_seconds")
+    @classmethod
+    def _validate_usage_snapshot_interval(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("USAGE_SNAPSHOT_INTERVAL_SECONDS must be >= 1.")
+        return value
 
-class TokenParts(BaseModel):
-    prefix: Annotated[str, Field(min_length=1)]
-    key_id: Annotated[str, Field(min_length=1)]
-    secret: Annotated[str, Field(min_length=1)]
+    @field_validator("usage_ingest_queue_size")
+    @classmethod
+    def _validate_usage_ingest_queue_size(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("USAGE_INGEST_QUEUE_SIZE must be >= 1.")
+        return value
 
-    @field_validator("prefix")
+    @field_validator("usage_ingest_flush_interval_ms")
     @classmethod
-    def _validate_prefix_value(cls, value: str) -> str:
-        candidate = value.strip()
-        if candidate == "" or PREFIX_RE.match(candidate) is None:
-            raise ValueError("Invalid token prefix.")
-        return candidate
+    def _validate_usage_ingest_flush_interval(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("USAGE_INGEST_FLUSH_INTERVAL_MS must be >= 1.")
+        return value
 
-    @field_validator("key_id")
+    @field_validator("quota_reservation_ttl_seconds")
     @classmethod
-    def _validate_key_id(cls, value: str) -> str:
-        candidate = value.strip()
-        if candidate == "" or KEY_ID_RE.match(candidate) is None:
-            raise ValueError("Invalid token key id.")
-        return candidate
+    def _validate_quota_reservation_ttl(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("QUOTA_RESERVATION_TTL_SECONDS must be >= 1.")
+        return value
 
-    @field_validator("secret")
+    @field_validator("quota_reservation_sweep_interval_seconds")
     @classmethod
-    def _validate_secret(cls, value: str) -> str:
-        candidate = value.strip()
-        if candidate == "":
-            raise ValueError("Invalid token secret.")
-        return candidate
+    def _validate_quota_reservation_sweep_interval(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("QUOTA_RESERVATION_SWEEP_INTERVAL_SECONDS must be >= 1.")
+        return value
+
+    @field_validator("usage_idempotency_ttl_seconds")
+    @classmethod
+    def _validate_usage_idempotency_ttl(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("USAGE_IDEMPOTENCY_TTL_SECONDS must be >= 1.")
+        return value
+
+    @field_validator("usage_idempotency_max_entries")
+    @classmethod
+    def _validate_usage_idempotency_max_entries(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("USAGE_IDEMPOTENCY_MAX_ENTRIES must be >= 1.")
+        return value
+
+    @field_validator("usage_batch_max_items")
+    @classmethod
+    def _validate_usage_batch_max_items(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("USAGE_BATCH_MAX_ITEMS must be >= 1.")
+        return value
+
+    @field_validator("concurrency_limit")
+    @classmethod
+    def _validate_concurrency_limit(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("CONCURRENCY_LIMIT must be >= 0.")
+        return value
+
+    @field_validator("concurrency_lease_ttl_seconds")
+    @classmethod
+    def _validate_concurrency_lease_ttl(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("CONCURRENCY_LEASE_TTL_SECONDS must be >= 1.")
+        return value
+
+    @field_validator("concurrency_retry_after_seconds")
+    @classmethod
+    def _validate_concurrency_retry_after(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("CONCURRENCY_RETRY_AFTER_SECONDS must be >= 1.")
+        return value
+
+    @field_validator("server_timing_sample_rate")
+    @classmethod
+    def _validate_server_timing_sample_rate(cls, value: float) -> float:
+        if value < 0 or value > 1:
+            raise ValueError("SERVER_TIMING_SAMPLE_RATE must be between 0 and 1.")
+        return value
+
+    @field_validator("access_log_sample_rate")
+    @classmethod
+    def _validate_access_log_sample_rate(cls, value: float) -> float:
+        if value < 0 or value > 1:
+            raise ValueError("ACCESS_LOG_SAMPLE_RATE must be between 0 and 1.")
+        return value
+
+    @field_validator("rate_limit_per_minute")
+    @classmethod
+    def _validate_rate_limit(cls, value: int) -> int:
+        if value < 0:
+            raise ValueError("RATE_LIMIT_PER_MINUTE must be >= 0.")
+        return value
+
+
+@dataclass(frozen=True, slots=True)
+class TokenParts:
+    prefix: str
+    key_id: str
+    secret: str
 
 
 __all__ = ["KEY_ID_RE", "PREFIX_RE", "Settings", "TokenParts"]
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from .backends import StateBackend
+
+logger = logging.getLogger(__name__)
+
+
+class UsageIngestor:
+    # Accept-and-queue usage accounting. Reports land in a bounded queue and a single
+    # flusher folds them into one charge per key every flush interval. Charges bypass the
+    # rate limiter: /usage takes the admission before it queues a report.
+    def __init__(
+        self,
+        backend: StateBackend,
+        *,
+        max_pending: int,
+        flush_interval_seconds: float,
+    ) -> None:
+        self._backend = backend
+        self._queue: asyncio.Queue[tuple[str, int]] = asyncio.Queue(max_pending)
+        self._flush_interval = flush_interval_seconds
+        self._carry: dict[str, int] = {}
+        self._flushing: asyncio.Future[None] | None = None
+        self._accepted = 0
+        self._rejected = 0
+        self._flushed = 0
+        self._failed = 0
+
+    def offer(self, key_id: str, tokens: int) -> bool:
+        try:
+            self._queue.put_nowait((key_id, tokens))
+        except asyncio.QueueFull:
+            self._rejected += 1
+            return False
+        self._accepted += 1
+        return True
+
+    def _collect(self) -> dict[str, int]:
+        totals, self._carry = self._carry, {}
+        while True:
+            try:
+                key_id, tokens = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return totals
+            totals[key_id] = totals.get(key_id, 0) + tokens
+
+    async def _charge(self, key_id: str, tokens: int) -> None:
+        try:
+            await self._backend.charge(key_id, tokens)
+        except RuntimeError:
+            self._failed += 1
+            self._carry[key_id] = self._carry.get(key_id, 0) + tokens
+        else:
+            self._flushed += 1
+
+    async def flush(self) -> None:
+        totals = self._collect()
+        if totals:
+            await asyncio.gather(
+                *(self._charge(key_id, tokens) for key_id, tokens in totals.items())
+            )
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            self._flushing = asyncio.ensure_future(self.flush())
+            await asyncio.shield(self._flushing)
+
+    async def drain(self) -> None:
+        if self._flushing is not None:
+            await asyncio.gather(self._flushing, return_exceptions=True)
+        await self.flush()
+        if self._carry:
+            logger.error(
+                "Dropping unflushed usage",
+                extra={"keys": len(self._carry), "tokens": sum(self._carry.values())},
+            )
+            self._carry = {}
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": self._queue.qsize(),
+            "carried": len(self._carry),
+            "accepted": self._accepted,
+            "rejected": self._rejected,
+            "flushed": self._flushed,
+            "failed": self._failed,
+        }
+
+
+__all__ = ["UsageIngestor"]
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import TypeAdapter
+
+from .models import RateLimitRule
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITS_TAG = "customRateLimits"
+
+_RULES = TypeAdapter(Dict[str, List[RateLimitRule]])
+
+
+@dataclass(frozen=True)
+class LimitWindow:
+    occurrence: int
+    period_seconds: float
+    starts_at: Optional[float]
+    ends_at: Optional[float]
+
+
+@dataclass(frozen=True)
+class KeyLimits:
+    rules: Dict[str, List[RateLimitRule]]
+    windows: Dict[str, tuple[LimitWindow, ...]]
+
+    def active_windows(self, tag: str, now: Optional[float] = None) -> list[tuple[int, float]]:
+        # Inactive rules keep their slot as (-1, period) so limiter state stays aligned
+        # with rule positions as rules come into or fall out of effect.
+        windows = self.windows.get(tag)
+        if not windows:
+            return []
+        now = time.time() if now is None else now
+        return [
+            (
+                window.occurrence
+                if (window.starts_at is None or window.starts_at <= now)
+                and (window.ends_at is None or now < window.ends_at)
+                else -1,
+                window.period_seconds,
+            )
+            for window in windows
+        ]
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+def format_key_limits(limits: Optional[KeyLimits]) -> Optional[str]:
+    # Inverse of parse_key_limits, for persisting rules alongside a key digest.
+    if limits is None:
+        return None
+    return _RULES.dump_json(limits.rules).decode()
+
+
+def parse_key_limits(raw: Optional[str]) -> Optional[KeyLimits]:
+    if not raw:
+        return None
+    try:
+        rules = _RULES.validate_json(raw)
+        windows = {
+            tag: tuple(
+                LimitWindow(
+                    occurrence=rule.occurrence,
+                    period_seconds=float(rule.periodSeconds),
+                    starts_at=_timestamp(rule.effectiveFrom),
+                    ends_at=_timestamp(rule.expiresAt),
+                )
+                for rule in tag_rules
+            )
+            for tag, tag_rules in rules.items()
+        }
+    except ValueError:
+        logger.warning("Ignoring malformed rate limit rules")
+        return None
+    return KeyLimits(rules=rules, windows=windows)
+
+
+__all__ = [
+    "KeyLimits",
+    "LimitWindow",
+    "RATE_LIMITS_TAG",
+    "format_key_limits",
+    "parse_key_limits",
+]
@@ -1,13 +1,114 @@
 from __future__ import annotations
 
+import atexit
+import json
 import logging
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
 
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
 
-def configure_logging(level: str) -> None:
-    logging.basicConfig(
-        level=level.upper(),
-        format="%(asctime)s %(levelname)s %(name)s %(message)s",
-    )
+_RECORD_FIELDS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
 
+_listener: Optional[QueueListener] = None
 
-__all__ = ["configure_logging"]
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        args = record.args
+        if record.name == "uvicorn.access" and isinstance(args, tuple) and len(args) == 5:
+            client, method, path, http_version, status = args
+            payload.update(
+                client=client, method=method, path=path, http_version=http_version, status=status
+            )
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and key not in payload:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        if record.stack_info:
+            payload["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(payload, default=str, separators=(",", ":"))
+
+
+class _DeferredQueueHandler(QueueHandler):
+    # The stock prepare() renders the message on the calling thread. Passing the record
+    # through leaves formatting, and the structured access-log args, to the listener.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class AccessLogSampler(logging.Filter):
+    # Keeps a fraction of successful uvicorn access lines; 4xx and 5xx always pass.
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        args = record.args
+        status = args[4] if isinstance(args, tuple) and len(args) == 5 else None
+        if not isinstance(status, int) or status >= 400:
+            return True
+        return random.random() < self.rate
+
+
+def stop_logging() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def configure_logging(
+    level: str,
+    *,
+    fmt: str = "text",
+    queued: bool = False,
+    access_sample_rate: float = 1.0,
+) -> None:
+    access = logging.getLogger("uvicorn.access")
+    for sampler in [f for f in access.filters if isinstance(f, AccessLogSampler)]:
+        access.removeFilter(sampler)
+    if access_sample_rate < 1.0:
+        access.addFilter(AccessLogSampler(access_sample_rate))
+
+    if fmt == "text" and not queued:
+        logging.basicConfig(level=level.upper(), format=TEXT_FORMAT)
+        return
+
+    global _listener
+    stop_logging()
+    handler: logging.Handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    if queued:
+        records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        _listener = QueueListener(records, handler, respect_handler_level=True)
+        _listener.start()
+        handler = _DeferredQueueHandler(records)
+    logging.basicConfig(level=level.upper(), handlers=[handler], force=True)
+    # Route uvicorn's own loggers through the root handler so every line shares the
+    # format and, when queued, the background writer.
+    for name in _UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+
+atexit.register(stop_logging)
+
+
+__all__ = ["AccessLogSampler", "JsonFormatter", "configure_logging", "stop_logging"]
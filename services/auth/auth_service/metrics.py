@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import math
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, Mapping, Sequence
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+Scope = dict[str, Any]
+Message = dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+@dataclass(frozen=True)
+class MetricFamily:
+    name: str
+    kind: str
+    help: str
+    samples: Sequence[tuple[Mapping[str, str], float]]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.samples:
+            names = tuple(labels)
+            values = tuple(labels.values())
+            lines.append(f"{self.name}{_labels(names, values)} {_number(value)}")
+        return lines
+
+
+# Instruments are updated from the event loop thread only, so they take no locks.
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self._labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {} if self._labelnames else {(): 0}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self._labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self._labelnames = tuple(labelnames)
+        self._buckets = tuple(buckets)
+        # Per series: one count per bucket plus +Inf, then the running sum.
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = [0] * (len(self._buckets) + 2)
+            self._series[labels] = series
+        series[bisect_left(self._buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self._labelnames + ("le",)
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self._buckets + (math.inf,), series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_labels(names, labels + (_number(bound),))} {cumulative}"
+                )
+            suffix = _labels(self._labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+Collector = Callable[[], Iterable[MetricFamily]]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._instruments: list[Counter | Histogram] = []
+        self._collectors: list[Collector] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        counter = Counter(name, help, labelnames)
+        self._instruments.append(counter)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        histogram = Histogram(name, help, labelnames, buckets)
+        self._instruments.append(histogram)
+        return histogram
+
+    def register(self, collector: Collector) -> Callable[[], None]:
+        # Collectors snapshot component stats at scrape time; the returned callable
+        # unregisters, so a restarted lifespan does not report the old state.
+        self._collectors.append(collector)
+        return lambda: self._collectors.remove(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for instrument in self._instruments:
+            lines.extend(instrument.render())
+        for collector in self._collectors:
+            for family in collector():
+                lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "auth_request_duration_seconds", "Request latency by endpoint.", ("endpoint",)
+)
+REQUESTS = REGISTRY.counter(
+    "auth_requests_total", "Responses by endpoint and status code.", ("endpoint", "status")
+)
+KEY_VAULT_DURATION = REGISTRY.histogram(
+    "auth_key_vault_request_duration_seconds",
+    "Key Vault get_secret latency by outcome.",
+    ("outcome",),
+)
+KEY_VAULT_ERRORS = REGISTRY.counter(
+    "auth_key_vault_errors_total", "Key Vault lookups that failed with an error."
+)
+REJECTIONS = REGISTRY.counter(
+    "auth_rejections_total", "Requests refused by a limit, by reason.", ("reason",)
+)
+
+
+class MetricsMiddleware:
+    # Plain ASGI rather than BaseHTTPMiddleware: no extra task or body streaming per
+    # request. Unknown paths share one "other" series to bound label cardinality.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._endpoints: frozenset[str] | None = None
+
+    def _endpoint(self, scope: Scope) -> str:
+        if self._endpoints is None:
+            routes = getattr(scope.get("app"), "routes", ())
+            self._endpoints = frozenset(getattr(route, "path", "") for route in routes)
+        path = scope["path"]
+        return path if path in self._endpoints else "other"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = self._endpoint(scope)
+            REQUEST_DURATION.observe(time.perf_counter() - start, endpoint)
+            REQUESTS.inc(endpoint, str(status))
+
+
+def gauge(name: str, help: str, value: float) -> MetricFamily:
+    return MetricFamily(name=name, kind="gauge", help=help, samples=[({}, value)])
+
+
+def counter(name: str, help: str, value: float) -> MetricFamily:
+    return MetricFamily(name=name, kind="counter", help=help, samples=[({}, value)])
+
+
+__all__ = [
+    "CONTENT_TYPE",
+    "Counter",
+    "Histogram",
+    "KEY_VAULT_DURATION",
+    "KEY_VAULT_ERRORS",
+    "LATENCY_BUCKETS",
+    "MetricFamily",
+    "MetricsMiddleware",
+    "REGISTRY",
+    "REJECTIONS",
+    "REQUESTS",
+    "REQUEST_DURATION",
+    "Registry",
+    "counter",
+    "gauge",
+]
@@ -9,6 +9,7 @@ class TokenRequest(BaseModel):
     model_config = ConfigDict(extra="ignore")
 
     token: Optional[str] = None
+    rate_limit_tag: Optional[str] = Field(default=None, min_length=1, max_length=64)
 
 
 class UsageConsumer(BaseModel):
@@ -33,6 +34,29 @@ class UsageReport(BaseModel):
     consumer: Optional[UsageConsumer] = None
     usage: Optional[UsageDetails] = None
     labels: Optional[Dict[str, Any]] = None
+    idempotency_key: Optional[str] = Field(default=None, min_length=1, max_length=255)
+
+
+class UsageBatchRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    items: List[UsageReport] = Field(default_factory=list)
+
+
+class ReserveRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    token: Optional[str] = None
+    estimated_tokens: int = Field(default=0, ge=0)
+    rate_limit_tag: Optional[str] = Field(default=None, min_length=1, max_length=64)
+
+
+class SettleRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    token: Optional[str] = None
+    reservation_id: str = Field(min_length=1)
+    usage: Optional[UsageDetails] = None
 
 
 class RateLimitRule(BaseModel):
@@ -67,9 +91,37 @@ class AuthResponse(BaseModel):
     data: UserData
 
 
+class ReservationResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    data: UserData
+    reservation_id: str
+    expires_at: float
+
+
+class UsageBatchResult(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    status: int
+    data: Optional[UserData] = None
+    detail: Optional[str] = None
+
+
+class UsageBatchResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    results: List[UsageBatchResult]
+
+
 __all__ = [
     "AuthResponse",
+    "ReservationResponse",
+    "ReserveRequest",
+    "SettleRequest",
     "TokenRequest",
+    "UsageBatchRequest",
+    "UsageBatchResponse",
+    "UsageBatchResult",
     "UsageReport",
     "UsageConsumer",
     "UsageDetails",
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from .auth import build_user
+from .limits import KeyLimits
+from .models import AuthResponse
+
+_WALLET = b'"wallet":{"total_balance":0,"total_used":0}'
+_BALANCE = b'"wallet":{"total_balance":'
+
+
+@dataclass(frozen=True)
+class ResponseTemplate:
+    limits: Optional[KeyLimits]
+    head: bytes
+    tail: bytes
+
+    def render(self, balance: int, used: Optional[int]) -> bytes:
+        balance = max(balance, 0)
+        if used is None:
+            return b"%s%d}%s" % (self.head, balance, self.tail)
+        return b'%s%d,"total_used":%d}%s' % (self.head, balance, used, self.tail)
+
+
+def build_template(key_id: str, limits: Optional[KeyLimits] = None) -> ResponseTemplate:
+    # Serialize once through the models so the template matches the response_model
+    # output byte for byte, then cut it around the wallet.
+    body = AuthResponse(
+        data=build_user(
+            key_id=key_id,
+            balance=0,
+            used=0,
+            custom_rate_limits=limits.rules if limits else None,
+        )
+    ).model_dump_json(exclude_none=True).encode()
+    head, found, tail = body.partition(_WALLET)
+    if not found:
+        raise ValueError("Unexpected AuthResponse layout")
+    return ResponseTemplate(limits=limits, head=head + _BALANCE, tail=tail)
+
+
+class ResponseCache:
+    # Encoded AuthResponse bodies per key with the wallet left open. An entry is rebuilt
+    # when the key's limits object changes, which happens whenever the secret is refetched.
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, ResponseTemplate] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def render(
+        self,
+        key_id: str,
+        balance: int,
+        used: Optional[int],
+        limits: Optional[KeyLimits] = None,
+    ) -> bytes:
+        if self._max_entries <= 0:
+            return build_template(key_id, limits).render(balance, used)
+        with self._lock:
+            template = self._entries.get(key_id)
+            if template is not None and template.limits is limits:
+                self._entries.move_to_end(key_id)
+                self._hits += 1
+                return template.render(balance, used)
+            self._misses += 1
+        template = build_template(key_id, limits)
+        with self._lock:
+            self._entries[key_id] = template
+            self._entries.move_to_end(key_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return template.render(balance, used)
+
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self._entries), "hits": self._hits, "misses": self._misses}
+
+
+__all__ = ["ResponseCache", "ResponseTemplate", "build_template"]
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from .limits import format_key_limits, parse_key_limits
+from .state import KeyDigest, KeyDigests
+
+logger = logging.getLogger(__name__)
+
+# Version 1 entries lack the rate-limit rules; loading them would skip enforcement.
+SNAPSHOT_VERSION = 2
+_NONCE_BYTES = 12
+_AAD = b"az-jina-auth-snapshot-v1"
+
+
+def decode_snapshot_key(value: str) -> bytes:
+    key = base64.urlsafe_b64decode(value.strip() + "=" * (-len(value.strip()) % 4))
+    if len(key) != 32:
+        raise ValueError("Snapshot key must be 32 bytes, base64-encoded.")
+    return key
+
+
+def digest_key(snapshot_key: bytes) -> bytes:
+    # Separate key for KeyDigests so the AES key is never used as a MAC key.
+    return hashlib.sha256(b"az-jina-auth-digest" + snapshot_key).digest()
+
+
+def save_snapshot(path: Path, key: bytes, digests: KeyDigests) -> int:
+    entries = digests.export()
+    payload = json.dumps(
+        {
+            "version": SNAPSHOT_VERSION,
+            "entries": {
+                name: [entry.digest.hex(), entry.validated_at, format_key_limits(entry.limits)]
+                for name, entry in entries.items()
+            },
+        },
+        separators=(",", ":"),
+    ).encode()
+    nonce = os.urandom(_NONCE_BYTES)
+    blob = nonce + AESGCM(key).encrypt(nonce, payload, _AAD)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(blob)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(tmp_name, 0o600)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return len(entries)
+
+
+def load_snapshot(path: Path, key: bytes) -> dict[str, KeyDigest]:
+    try:
+        blob = path.read_bytes()
+    except FileNotFoundError:
+        return {}
+    try:
+        payload = AESGCM(key).decrypt(blob[:_NONCE_BYTES], blob[_NONCE_BYTES:], _AAD)
+        data = json.loads(payload)
+    except (InvalidTag, ValueError):
+        logger.warning("Ignoring unreadable auth snapshot", extra={"path": str(path)})
+        return {}
+    if data.get("version") != SNAPSHOT_VERSION:
+        logger.warning("Ignoring auth snapshot with unknown version", extra={"path": str(path)})
+        return {}
+    return {
+        name: KeyDigest(
+            digest=bytes.fromhex(digest),
+            validated_at=float(validated_at),
+            limits=parse_key_limits(limits),
+        )
+        for name, (digest, validated_at, limits) in data.get("entries", {}).items()
+    }
+
+
+__all__ = [
+    "SNAPSHOT_VERSION",
+    "decode_snapshot_key",
+    "digest_key",
+    "load_snapshot",
+    "save_snapshot",
+]
@@ -1,43 +1,393 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import hmac
+import secrets
 import threading
 import time
-from collections import deque
+from collections import OrderedDict, deque
 from dataclasses import dataclass
-from typing import Deque, Dict, Optional
+from typing import (
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    Optional,
+    Protocol,
+    Sequence,
+    TypeVar,
+)
+
+from .limits import KeyLimits
+
+T = TypeVar("T")
+V = TypeVar("V")
 
 
 @dataclass(frozen=True)
 class CacheEntry:
     value: Optional[str]
+    stale_at: float
     expires_at: float
+    limits: Optional[KeyLimits] = None
+
+
+@dataclass(frozen=True)
+class KeyDigest:
+    digest: bytes
+    validated_at: float
+    limits: Optional[KeyLimits] = None
+
+
+class KeyDigests:
+    # Keyed digests of secrets last confirmed by Key Vault, with wall-clock timestamps so
+    # they survive a restart through the on-disk snapshot. The key's rate-limit rules ride
+    # along, so a digest match enforces the same limits as a cached secret.
+    def __init__(self, digest_key: bytes, max_entries: int = 10_000) -> None:
+        self._digest_key = digest_key
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, KeyDigest] = OrderedDict()
+
+    def _digest(self, secret: str) -> bytes:
+        return hashlib.blake2b(secret.encode(), key=self._digest_key, digest_size=32).digest()
+
+    def remember(self, name: str, secret: str, limits: Optional[KeyLimits] = None) -> None:
+        entry = KeyDigest(digest=self._digest(secret), validated_at=time.time(), limits=limits)
+        with self._lock:
+            self._entries[name] = entry
+            self._entries.move_to_end(name)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def confirm(self, name: str) -> None:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries[name] = KeyDigest(
+                    digest=entry.digest, validated_at=time.time(), limits=entry.limits
+                )
+
+    def forget(self, name: str) -> None:
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def verify(
+        self, name: str, secret: str, max_age_seconds: float
+    ) -> tuple[bool, Optional[KeyLimits]]:
+        if max_age_seconds <= 0:
+            return False, None
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None or time.time() - entry.validated_at > max_age_seconds:
+            return False, None
+        if not hmac.compare_digest(entry.digest, self._digest(secret)):
+            return False, None
+        return True, entry.limits
+
+    def export(self) -> dict[str, KeyDigest]:
+        with self._lock:
+            return dict(self._entries)
+
+    def load(self, entries: dict[str, KeyDigest]) -> None:
+        # Oldest first, so the newest loaded digests end up nearest the most recently used
+        # end, behind any digest remembered since startup.
+        ordered = sorted(entries.items(), key=lambda item: item[1].validated_at)
+        with self._lock:
+            merged: OrderedDict[str, KeyDigest] = OrderedDict(
+                (name, entry) for name, entry in ordered if name not in self._entries
+            )
+            merged.update(self._entries)
+            while len(merged) > self._max_entries:
+                merged.popitem(last=False)
+            self._entries = merged
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class ShardedMap(Generic[V]):
+    # Lock striping: keys hash to one of N independently locked dicts.
+    def __init__(self, shards: int = 1, factory: Callable[[], Dict[str, V]] = dict) -> None:
+        self._shards: list[tuple[threading.Lock, Dict[str, V]]] = [
+            (threading.Lock(), factory()) for _ in range(max(shards, 1))
+        ]
+
+    def shard(self, key: str) -> tuple[threading.Lock, Dict[str, V]]:
+        shards = self._shards
+        if len(shards) == 1:
+            return shards[0]
+        return shards[hash(key) % len(shards)]
+
+    def __iter__(self) -> Iterator[tuple[threading.Lock, Dict[str, V]]]:
+        return iter(self._shards)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for _, entries in self._shards)
+
+
+class _CacheShard:
+    __slots__ = (
+        "lock",
+        "entries",
+        "negative",
+        "hits",
+        "negative_hits",
+        "misses",
+        "evictions",
+        "expirations",
+    )
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # Recency order: least recently used first.
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.negative: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
 
 class SecretCache:
-    def __init__(self, ttl_seconds: int) -> None:
+    _SWEEP_BATCH = 2
+
+    def __init__(
+        self,
+        ttl_seconds: int,
+        stale_seconds: int = 0,
+        *,
+        max_entries: int = 10_000,
+        negative_ttl_seconds: Optional[int] = None,
+        max_negative_entries: int = 10_000,
+        digests: Optional[KeyDigests] = None,
+        shards: int = 1,
+    ) -> None:
+        shards = max(shards, 1)
         self._ttl_seconds = ttl_seconds
-        self._lock = threading.Lock()
-        self._entries: Dict[str, CacheEntry] = {}
+        self._stale_seconds = stale_seconds
+        self._negative_ttl_seconds = (
+            ttl_seconds if negative_ttl_seconds is None else negative_ttl_seconds
+        )
+        # Capacities are enforced per shard, so LRU order is approximate across shards.
+        self._max_entries = -(-max_entries // shards)
+        self._max_negative_entries = -(-max_negative_entries // shards)
+        self.digests = digests
+        self._shards = [_CacheShard() for _ in range(shards)]
+
+    def _shard(self, key: str) -> _CacheShard:
+        shards = self._shards
+        if len(shards) == 1:
+            return shards[0]
+        return shards[hash(key) % len(shards)]
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self._ttl_seconds
 
     def get(self, key: str) -> tuple[bool, Optional[str]]:
+        hit, value, _, _ = self.lookup(key)
+        return hit, value
+
+    def lookup(self, key: str) -> tuple[bool, Optional[str], bool, Optional[KeyLimits]]:
         if self._ttl_seconds == 0:
-            return False, None
+            return False, None, False, None
         now = time.monotonic()
-        with self._lock:
-            entry = self._entries.get(key)
+        shard = self._shard(key)
+        with shard.lock:
+            entries = shard.entries
+            entry = entries.get(key)
             if entry is None:
-                return False, None
+                entries = shard.negative
+                entry = entries.get(key)
+            if entry is None:
+                shard.misses += 1
+                return False, None, False, None
             if entry.expires_at <= now:
-                self._entries.pop(key, None)
-                return False, None
-            return True, entry.value
+                del entries[key]
+                shard.expirations += 1
+                shard.misses += 1
+                return False, None, False, None
+            entries.move_to_end(key)
+            if entry.value is None:
+                shard.negative_hits += 1
+            else:
+                shard.hits += 1
+            return True, entry.value, entry.stale_at <= now, entry.limits
 
-    def set(self, key: str, value: Optional[str]) -> None:
+    def set(self, key: str, value: Optional[str], limits: Optional[KeyLimits] = None) -> None:
+        if self.digests is not None:
+            if value is None:
+                self.digests.forget(key)
+            else:
+                self.digests.remember(key, value, limits)
         if self._ttl_seconds == 0:
             return
-        expires_at = time.monotonic() + self._ttl_seconds
-        with self._lock:
-            self._entries[key] = CacheEntry(value=value, expires_at=expires_at)
+        now = time.monotonic()
+        shard = self._shard(key)
+        if value is None:
+            if self._negative_ttl_seconds == 0 or self._max_negative_entries == 0:
+                with shard.lock:
+                    shard.entries.pop(key, None)
+                return
+            expires_at = now + self._negative_ttl_seconds
+            entry = CacheEntry(value=None, stale_at=expires_at, expires_at=expires_at)
+            target, other, capacity = shard.negative, shard.entries, self._max_negative_entries
+        else:
+            stale_at = now + self._ttl_seconds
+            entry = CacheEntry(
+                value=value,
+                stale_at=stale_at,
+                expires_at=stale_at + self._stale_seconds,
+                limits=limits,
+            )
+            target, other, capacity = shard.entries, shard.negative, self._max_entries
+        with shard.lock:
+            other.pop(key, None)
+            target[key] = entry
+            target.move_to_end(key)
+            self._sweep(shard, target, now)
+            while len(target) > capacity:
+                target.popitem(last=False)
+                shard.evictions += 1
+
+    def touch(self, key: str) -> bool:
+        if self.digests is not None:
+            self.digests.confirm(key)
+        if self._ttl_seconds == 0:
+            return False
+        now = time.monotonic()
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                return False
+            stale_at = now + self._ttl_seconds
+            shard.entries[key] = CacheEntry(
+                value=entry.value,
+                stale_at=stale_at,
+                expires_at=stale_at + self._stale_seconds,
+                limits=entry.limits,
+            )
+            return True
+
+    def _sweep(self, shard: _CacheShard, entries: OrderedDict[str, CacheEntry], now: float) -> None:
+        # Entries that stopped being read drift to the LRU end, so checking a couple of
+        # them per write reclaims expired entries in amortized O(1).
+        for _ in range(self._SWEEP_BATCH):
+            if not entries:
+                return
+            key, entry = next(iter(entries.items()))
+            if entry.expires_at > now:
+                return
+            del entries[key]
+            shard.expirations += 1
+
+    def stats(self) -> dict[str, float]:
+        totals = dict.fromkeys(
+            (
+                "size",
+                "negative_size",
+                "hits",
+                "negative_hits",
+                "misses",
+                "evictions",
+                "expirations",
+            ),
+            0,
+        )
+        for shard in self._shards:
+            with shard.lock:
+                totals["size"] += len(shard.entries)
+                totals["negative_size"] += len(shard.negative)
+                totals["hits"] += shard.hits
+                totals["negative_hits"] += shard.negative_hits
+                totals["misses"] += shard.misses
+                totals["evictions"] += shard.evictions
+                totals["expirations"] += shard.expirations
+        found = totals["hits"] + totals["negative_hits"]
+        lookups = found + totals["misses"]
+        return {**totals, "hit_ratio": found / lookups if lookups else 0.0}
+
+
+class ResultCache(Generic[T]):
+    # Recent results by key, bounded by age and count. Every entry gets the same TTL, so
+    # insertion order is expiry order and both bounds trim from the front.
+    def __init__(self, ttl_seconds: float, max_entries: int, shards: int = 1) -> None:
+        self._ttl = ttl_seconds
+        self._max_entries = max(max_entries // max(shards, 1), 1)
+        self._entries: ShardedMap[tuple[float, T]] = ShardedMap(shards, OrderedDict)
+
+    def get(self, key: str) -> Optional[T]:
+        lock, entries = self._entries.shard(key)
+        with lock:
+            entry = entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+
+    def put(self, key: str, value: T) -> None:
+        now = time.monotonic()
+        lock, entries = self._entries.shard(key)
+        with lock:
+            entries[key] = (now + self._ttl, value)
+            entries.move_to_end(key)
+            while entries:
+                oldest_key, (expires_at, _) = next(iter(entries.items()))
+                if expires_at > now and len(entries) <= self._max_entries:
+                    break
+                del entries[oldest_key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._started = 0
+        self._coalesced = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start(key, factory)
+        else:
+            self._coalesced += 1
+        # Shielded so a cancelled caller does not cancel the fetch for the other waiters.
+        return await asyncio.shield(task)
+
+    def spawn(self, key: str, factory: Callable[[], Awaitable[T]]) -> None:
+        if key in self._inflight:
+            self._coalesced += 1
+            return
+        self._start(key, factory)
+
+    def _start(self, key: str, factory: Callable[[], Awaitable[T]]) -> asyncio.Task:
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        self._started += 1
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return task
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "started": self._started,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._inflight),
+        }
 
 
 @dataclass
@@ -46,55 +396,490 @@ class UsageState:
     used: int
 
 
+@dataclass(frozen=True)
+class Admission:
+    # rejected names the check that refused the request, as labelled in the rejection
+    # metric; retry_after is only set for custom rate limits.
+    usage_state: UsageState
+    rejected: Optional[str] = None
+    retry_after: float = 0.0
+
+
+_EVICT_BATCH = 1024
+_SECOND_NS = 1_000_000_000
+_MINUTE_NS = 60 * _SECOND_NS
+
+
+def _evict_batched(
+    lock: threading.Lock,
+    entries: Dict[str, V],
+    is_idle: Callable[[V, float], bool],
+    evicted_values: Optional[list[V]] = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> int:
+    # Scan a snapshot of the keys and re-check each candidate under the lock, one batch
+    # at a time, so request threads never wait behind a full scan.
+    keys = list(entries)
+    evicted = 0
+    for start in range(0, len(keys), _EVICT_BATCH):
+        now = clock()
+        with lock:
+            for key in keys[start : start + _EVICT_BATCH]:
+                value = entries.get(key)
+                if value is not None and is_idle(value, now):
+                    del entries[key]
+                    evicted += 1
+                    if evicted_values is not None:
+                        evicted_values.append(value)
+    return evicted
+
+
+class UsageJournal(Protocol):
+    def append(self, key_id: str, balance: int, used: int) -> None: ...
+
+
 class UsageTracker:
-    def __init__(self, default_balance: int) -> None:
+    def __init__(
+        self,
+        default_balance: int,
+        shards: int = 1,
+        journal: Optional[UsageJournal] = None,
+    ) -> None:
         self._default_balance = default_balance
-        self._lock = threading.Lock()
-        self._state: Dict[str, UsageState] = {}
+        self._state: ShardedMap[UsageState] = ShardedMap(shards)
+        self._journal = journal
+        self._evicted = 0
 
     def get_state(self, key_id: str) -> UsageState:
-        with self._lock:
-            state = self._state.get(key_id)
+        lock, entries = self._state.shard(key_id)
+        with lock:
+            state = entries.get(key_id)
             if state is None:
-                state = UsageState(balance=self._default_balance, used=0)
-                self._state[key_id] = state
+                return UsageState(balance=self._default_balance, used=0)
             return UsageState(balance=state.balance, used=state.used)
 
+    def _entry(self, entries: Dict[str, UsageState], key_id: str) -> UsageState:
+        state = entries.get(key_id)
+        if state is None:
+            state = UsageState(balance=self._default_balance, used=0)
+            entries[key_id] = state
+        return state
+
+    def _journal_state(self, key_id: str, state: UsageState) -> None:
+        # Called under the shard lock so journal order matches mutation order.
+        if self._journal is not None:
+            self._journal.append(key_id, state.balance, state.used)
+
+    @staticmethod
+    def _debit(state: UsageState, tokens: int) -> bool:
+        out_of_quota = state.balance <= 0 or tokens > state.balance
+        if tokens > 0:
+            state.balance = max(state.balance - tokens, 0)
+            state.used += tokens
+        return out_of_quota
+
     def consume(self, key_id: str, tokens: int) -> tuple[UsageState, bool]:
-        with self._lock:
-            state = self._state.get(key_id)
-            if state is None:
-                state = UsageState(balance=self._default_balance, used=0)
-                self._state[key_id] = state
-            out_of_quota = state.balance <= 0 or tokens > state.balance
+        lock, entries = self._state.shard(key_id)
+        with lock:
+            state = self._entry(entries, key_id)
+            out_of_quota = self._debit(state, tokens)
             if tokens > 0:
-                state.balance = max(state.balance - tokens, 0)
-                state.used += tokens
+                self._journal_state(key_id, state)
             return UsageState(balance=state.balance, used=state.used), out_of_quota
 
+    def hold(self, key_id: str, amount: int) -> tuple[UsageState, bool]:
+        lock, entries = self._state.shard(key_id)
+        with lock:
+            state = self._entry(entries, key_id)
+            if state.balance <= 0 or amount > state.balance:
+                return UsageState(balance=state.balance, used=state.used), False
+            if amount > 0:
+                state.balance -= amount
+                self._journal_state(key_id, state)
+            return UsageState(balance=state.balance, used=state.used), True
+
+    def settle(self, key_id: str, held: int, tokens: int) -> tuple[UsageState, bool]:
+        lock, entries = self._state.shard(key_id)
+        with lock:
+            state = self._entry(entries, key_id)
+            state.balance += held
+            out_of_quota = self._debit(state, tokens)
+            if held > 0 or tokens > 0:
+                self._journal_state(key_id, state)
+            return UsageState(balance=state.balance, used=state.used), out_of_quota
+
+    def release(self, key_id: str, held: int) -> None:
+        if held <= 0:
+            return
+        lock, entries = self._state.shard(key_id)
+        with lock:
+            state = self._entry(entries, key_id)
+            state.balance += held
+            self._journal_state(key_id, state)
+
+    def export(self) -> Dict[str, tuple[int, int]]:
+        exported: Dict[str, tuple[int, int]] = {}
+        for lock, entries in self._state:
+            with lock:
+                for key_id, state in entries.items():
+                    exported[key_id] = (state.balance, state.used)
+        return exported
+
+    def load(self, states: Dict[str, tuple[int, int]]) -> None:
+        for key_id, (balance, used) in states.items():
+            lock, entries = self._state.shard(key_id)
+            with lock:
+                entries[key_id] = UsageState(balance=balance, used=used)
+
+    def evict_idle(self) -> int:
+        # Only entries still at the default wallet can be rebuilt on demand; anything
+        # with recorded usage is kept.
+        default = self._default_balance
+        evicted = 0
+        for lock, entries in self._state:
+            evicted += _evict_batched(
+                lock, entries, lambda state, _now: state.used == 0 and state.balance == default
+            )
+        self._evicted += evicted
+        return evicted
+
+    def stats(self) -> dict[str, int]:
+        return {"keys": len(self._state), "evicted": self._evicted}
+
+
+@dataclass(frozen=True)
+class Reservation:
+    reservation_id: str
+    key_id: str
+    amount: int
+    expires_at: float
+
+
+class ReservationJournal(Protocol):
+    def append_hold(self, hold: Reservation) -> None: ...
+
+    def append_release(self, reservation_id: str) -> None: ...
+
+
+class ReservationBook:
+    # Outstanding quota holds by reservation id. Whoever removes a hold (settle or the
+    # sweeper) owns returning it to the wallet, so a hold is never refunded twice. The
+    # journal sees holds and releases so the amounts held survive a restart.
+    def __init__(self, shards: int = 1, journal: Optional[ReservationJournal] = None) -> None:
+        self._holds: ShardedMap[Reservation] = ShardedMap(shards)
+        self._journal = journal
+        self._expired = 0
+
+    def add(self, key_id: str, amount: int, ttl_seconds: float) -> tuple[str, float]:
+        hold = Reservation(secrets.token_urlsafe(12), key_id, amount, time.time() + ttl_seconds)
+        lock, entries = self._holds.shard(hold.reservation_id)
+        with lock:
+            entries[hold.reservation_id] = hold
+            if self._journal is not None:
+                self._journal.append_hold(hold)
+        return hold.reservation_id, hold.expires_at
+
+    def take(self, reservation_id: str, key_id: str) -> int:
+        lock, entries = self._holds.shard(reservation_id)
+        with lock:
+            hold = entries.get(reservation_id)
+            if hold is None or hold.key_id != key_id:
+                return 0
+            del entries[reservation_id]
+            if self._journal is not None:
+                self._journal.append_release(reservation_id)
+        return hold.amount
+
+    def expire(self) -> list[Reservation]:
+        expired: list[Reservation] = []
+        for lock, entries in self._holds:
+            _evict_batched(
+                lock, entries, lambda hold, now: hold.expires_at <= now, expired, time.time
+            )
+        if self._journal is not None:
+            for hold in expired:
+                self._journal.append_release(hold.reservation_id)
+        self._expired += len(expired)
+        return expired
+
+    def export(self) -> list[Reservation]:
+        exported: list[Reservation] = []
+        for lock, entries in self._holds:
+            with lock:
+                exported.extend(entries.values())
+        return exported
+
+    def load(self, holds: Iterable[Reservation]) -> None:
+        for hold in holds:
+            lock, entries = self._holds.shard(hold.reservation_id)
+            with lock:
+                entries[hold.reservation_id] = hold
+
+    def stats(self) -> dict[str, int]:
+        return {"holds": len(self._holds), "expired": self._expired}
+
+
+class RateLimitEngine(Protocol):
+    def allow(self, key_id: str) -> bool: ...
+
+    def check(self, key_id: str) -> bool: ...
+
+    def evict_idle(self) -> int: ...
+
+    def stats(self) -> dict[str, int]: ...
+
 
 class RateLimiter:
-    def __init__(self, limit_per_minute: int) -> None:
+    def __init__(self, limit_per_minute: int, shards: int = 1) -> None:
         self._limit = limit_per_minute
-        self._lock = threading.Lock()
-        self._hits: Dict[str, Deque[float]] = {}
+        self._hits: ShardedMap[Deque[float]] = ShardedMap(shards)
+        self._rejected = 0
+        self._evicted = 0
 
     def allow(self, key_id: str) -> bool:
+        return self._admit(key_id, take=True)
+
+    def check(self, key_id: str) -> bool:
+        return self._admit(key_id, take=False)
+
+    def _admit(self, key_id: str, take: bool) -> bool:
         if self._limit <= 0:
             return True
         now = time.monotonic()
         cutoff = now - 60.0
-        with self._lock:
-            bucket = self._hits.get(key_id)
+        lock, hits = self._hits.shard(key_id)
+        with lock:
+            bucket = hits.get(key_id)
             if bucket is None:
                 bucket = deque()
-                self._hits[key_id] = bucket
+                hits[key_id] = bucket
             while bucket and bucket[0] < cutoff:
                 bucket.popleft()
             if len(bucket) >= self._limit:
+                self._rejected += 1
                 return False
-            bucket.append(now)
+            if take:
+                bucket.append(now)
             return True
 
+    def evict_idle(self) -> int:
+        evicted = 0
+        for lock, hits in self._hits:
+            evicted += _evict_batched(
+                lock, hits, lambda bucket, now: not bucket or bucket[-1] < now - 60.0
+            )
+        self._evicted += evicted
+        return evicted
+
+    def stats(self) -> dict[str, int]:
+        return {"keys": len(self._hits), "rejected": self._rejected, "evicted": self._evicted}
+
+
+class GcraRateLimiter:
+    # Generic cell rate algorithm: one theoretical arrival time per key, O(1) per decision.
+    # Allows bursts of up to limit_per_minute, refilling evenly across the minute. Times
+    # are integers in units of 1/limit ns, so the emission interval is exactly one minute
+    # of nanoseconds and a burst never loses a request to float rounding.
+    def __init__(self, limit_per_minute: int, shards: int = 1) -> None:
+        self._limit = limit_per_minute
+        self._horizon = _MINUTE_NS * limit_per_minute
+        self._tat: ShardedMap[int] = ShardedMap(shards)
+        self._rejected = 0
+        self._evicted = 0
+
+    def _now(self) -> int:
+        return time.monotonic_ns() * self._limit
+
+    def allow(self, key_id: str) -> bool:
+        return self._admit(key_id, take=True)
+
+    def check(self, key_id: str) -> bool:
+        return self._admit(key_id, take=False)
+
+    def _admit(self, key_id: str, take: bool) -> bool:
+        if self._limit <= 0:
+            return True
+        now = self._now()
+        lock, arrivals = self._tat.shard(key_id)
+        with lock:
+            tat = arrivals.get(key_id, now)
+            if tat < now:
+                tat = now
+            new_tat = tat + _MINUTE_NS
+            if new_tat - now > self._horizon:
+                self._rejected += 1
+                return False
+            if take:
+                arrivals[key_id] = new_tat
+            return True
+
+    def evict_idle(self) -> int:
+        # A key whose arrival time has passed is fully refilled, same as an unseen key.
+        evicted = 0
+        for lock, arrivals in self._tat:
+            evicted += _evict_batched(
+                lock, arrivals, lambda tat, now: tat <= now, clock=self._now
+            )
+        self._evicted += evicted
+        return evicted
+
+    def stats(self) -> dict[str, int]:
+        return {"keys": len(self._tat), "rejected": self._rejected, "evicted": self._evicted}
+
+
+class LeaseTable:
+    # In-flight leases per key as a deque of expiry times. Every lease of a table gets
+    # the same TTL, so the deque is expiry ordered: expired leases fall off the left and
+    # a release retires the oldest live lease.
+    def __init__(self, ttl_seconds: float, shards: int = 1) -> None:
+        self._ttl = ttl_seconds
+        self._state: ShardedMap[Deque[float]] = ShardedMap(shards)
+        self._rejected = 0
+        self._evicted = 0
+
+    @staticmethod
+    def _expire(leases: Deque[float], now: float) -> None:
+        while leases and leases[0] <= now:
+            leases.popleft()
+
+    def acquire(self, key_id: str, limit: int) -> bool:
+        return self._acquire(key_id, limit, take=True)
+
+    def check(self, key_id: str, limit: int) -> bool:
+        return self._acquire(key_id, limit, take=False)
+
+    def _acquire(self, key_id: str, limit: int, take: bool) -> bool:
+        now = time.monotonic()
+        lock, entries = self._state.shard(key_id)
+        with lock:
+            leases = entries.get(key_id)
+            if leases is None:
+                leases = deque()
+                entries[key_id] = leases
+            self._expire(leases, now)
+            if len(leases) >= limit:
+                self._rejected += 1
+                return False
+            if take:
+                leases.append(now + self._ttl)
+            return True
+
+    def release(self, key_id: str, count: int = 1) -> None:
+        now = time.monotonic()
+        lock, entries = self._state.shard(key_id)
+        with lock:
+            leases = entries.get(key_id)
+            if leases is None:
+                return
+            self._expire(leases, now)
+            for _ in range(min(count, len(leases))):
+                leases.popleft()
+
+    def evict_idle(self) -> int:
+        evicted = 0
+        for lock, entries in self._state:
+            evicted += _evict_batched(
+                lock, entries, lambda leases, now: not leases or leases[-1] <= now
+            )
+        self._evicted += evicted
+        return evicted
+
+    def stats(self) -> dict[str, int]:
+        return {"keys": len(self._state), "rejected": self._rejected, "evicted": self._evicted}
+
+
+class MultiWindowLimiter:
+    # One GCRA cell per window: a request must fit every window of its rule set and is
+    # charged to all of them, in a single pass under one lock. Windows are
+    # (occurrence, period_seconds); occurrence 0 blocks, negative skips the window. As in
+    # GcraRateLimiter, a cell's arrival time is an integer in units of 1/occurrence ns,
+    # stored with the occurrence it was scaled by.
+    def __init__(self, shards: int = 1) -> None:
+        self._state: ShardedMap[list[tuple[int, int]]] = ShardedMap(shards)
+        self._rejected = 0
+        self._evicted = 0
+
+    def allow(self, key: str, windows: Sequence[tuple[int, float]]) -> tuple[bool, float]:
+        return self._admit(key, windows, take=True)
+
+    def check(self, key: str, windows: Sequence[tuple[int, float]]) -> tuple[bool, float]:
+        return self._admit(key, windows, take=False)
+
+    def _admit(
+        self, key: str, windows: Sequence[tuple[int, float]], take: bool
+    ) -> tuple[bool, float]:
+        now_ns = time.monotonic_ns()
+        lock, entries = self._state.shard(key)
+        with lock:
+            cells = entries.get(key)
+            if cells is None or len(cells) != len(windows):
+                cells = [(0, 0)] * len(windows)
+            wait = 0.0
+            updated: list[tuple[int, int]] = []
+            for (tat, scale), (occurrence, period) in zip(cells, windows):
+                if occurrence < 0:
+                    updated.append((tat, scale))
+                    continue
+                period_ns = round(period * _SECOND_NS)
+                if occurrence == 0:
+                    wait = max(wait, period_ns)
+                    continue
+                if scale != occurrence:
+                    # The rule changed: carry the arrival time over, rounded up to a whole ns.
+                    tat = -(-tat // scale) * occurrence if scale else 0
+                now = now_ns * occurrence
+                tat = max(tat, now) + period_ns
+                overshoot = tat - period_ns * occurrence - now
+                if overshoot > 0:
+                    wait = max(wait, overshoot / occurrence)
+                updated.append((tat, occurrence))
+            if wait > 0:
+                self._rejected += 1
+                return False, wait / _SECOND_NS
+            if take:
+                entries[key] = updated
+            return True, 0.0
+
+    def evict_idle(self) -> int:
+        evicted = 0
+        for lock, entries in self._state:
+            evicted += _evict_batched(
+                lock,
+                entries,
+                lambda cells, now: all(tat <= now * scale for tat, scale in cells),
+                clock=time.monotonic_ns,
+            )
+        self._evicted += evicted
+        return evicted
+
+    def stats(self) -> dict[str, int]:
+        return {"keys": len(self._state), "rejected": self._rejected, "evicted": self._evicted}
+
+
+def create_rate_limiter(engine: str, limit_per_minute: int, shards: int = 1) -> RateLimitEngine:
+    if engine == "gcra":
+        return GcraRateLimiter(limit_per_minute, shards)
+    return RateLimiter(limit_per_minute, shards)
+
 
-__all__ = ["RateLimiter", "SecretCache", "UsageState", "UsageTracker"]
+__all__ = [
+    "Admission",
+    "GcraRateLimiter",
+    "KeyDigest",
+    "KeyDigests",
+    "LeaseTable",
+    "MultiWindowLimiter",
+    "RateLimitEngine",
+    "RateLimiter",
+    "Reservation",
+    "ReservationBook",
+    "ReservationJournal",
+    "ResultCache",
+    "SecretCache",
+    "ShardedMap",
+    "SingleFlight",
+    "UsageJournal",
+    "UsageState",
+    "UsageTracker",
+    "create_rate_limiter",
+]
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import random
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from .metrics import ASGIApp, Message, Receive, Scope, Send
+
+_CURRENT: ContextVar[Optional["ServerTiming"]] = ContextVar("server_timing", default=None)
+
+
+class ServerTiming:
+    __slots__ = ("phases",)
+
+    def __init__(self) -> None:
+        self.phases: dict[str, int] = {}
+
+    def record(self, name: str, start_ns: int) -> int:
+        now = time.perf_counter_ns()
+        self.phases[name] = self.phases.get(name, 0) + now - start_ns
+        return now
+
+    def header(self) -> str:
+        return ", ".join(f"{name};dur={ns / 1e6:.3f}" for name, ns in self.phases.items())
+
+
+def record_phase(name: str, start_ns: int) -> None:
+    # Phases are only kept for sampled requests; otherwise this is one context lookup.
+    timing = _CURRENT.get()
+    if timing is not None:
+        timing.record(name, start_ns)
+
+
+class ServerTimingMiddleware:
+    # Samples requests at SERVER_TIMING_SAMPLE_RATE and appends a Server-Timing header
+    # with the phases recorded while handling them, plus the total up to the response.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        state = getattr(scope.get("app").state, "auth", None) if scope["type"] == "http" else None
+        rate = state.settings.server_timing_sample_rate if state is not None else 0.0
+        if rate <= 0.0 or (rate < 1.0 and random.random() >= rate):
+            await self.app(scope, receive, send)
+            return
+        timing = ServerTiming()
+        token = _CURRENT.set(timing)
+        start = time.perf_counter_ns()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timing.record("total", start)
+                headers = list(message.get("headers", ()))
+                headers.append((b"server-timing", timing.header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _CURRENT.reset(token)
+
+
+__all__ = ["ServerTiming", "ServerTimingMiddleware", "record_phase"]
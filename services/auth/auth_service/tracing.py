@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import sys
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, ContextManager, Mapping, Optional
+
+from .metrics import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    from opentelemetry.propagate import extract
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SpanExporter,
+    )
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from opentelemetry.trace import SpanKind, Status, StatusCode, Tracer
+except ImportError:  # the "tracing" extra is not installed
+    TracerProvider = None  # type: ignore[assignment,misc]
+
+_NOOP: ContextManager[Any] = nullcontext()
+_tracer: Optional["Tracer"] = None
+
+
+@dataclass(frozen=True)
+class Tracing:
+    provider: "TracerProvider"
+    exporter: "SpanExporter"
+
+
+def _create_exporter(kind: str, file_path: Optional[str]) -> "SpanExporter":
+    if kind == "otlp":
+        # Endpoint, headers and timeout come from the standard OTEL_EXPORTER_OTLP_* variables.
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    if kind == "file" and file_path:
+        return ConsoleSpanExporter(
+            out=open(file_path, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+    return InMemorySpanExporter()
+
+
+def configure_tracing(
+    kind: str, *, service_name: str, file_path: Optional[str] = None
+) -> Optional[Tracing]:
+    global _tracer
+    if kind == "none":
+        return None
+    if TracerProvider is None:
+        raise RuntimeError("TRACING_EXPORTER requires the 'tracing' extra to be installed.")
+    # A provider per lifespan rather than the process-wide global, which can only be
+    # set once. Sampling follows OTEL_TRACES_SAMPLER and the incoming traceparent.
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    exporter = _create_exporter(kind, file_path)
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = provider.get_tracer("auth_service")
+    return Tracing(provider=provider, exporter=exporter)
+
+
+def shutdown_tracing(tracing: Optional[Tracing]) -> None:
+    global _tracer
+    _tracer = None
+    if tracing is not None:
+        tracing.provider.shutdown()
+        out = getattr(tracing.exporter, "out", None)
+        if out is not None and out not in (sys.stdout, sys.stderr):
+            out.close()
+
+
+def start_span(name: str, attributes: Optional[Mapping[str, Any]] = None) -> ContextManager[Any]:
+    # Yields the span, or None when tracing is off so call sites can skip attributes.
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+class TracingMiddleware:
+    # Opens the server span, continuing the caller's trace from its traceparent header.
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        tracer = _tracer
+        if tracer is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        carrier = {
+            key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]
+        }
+        method = scope["method"]
+        path = scope["path"]
+        with tracer.start_as_current_span(
+            f"{method} {path}",
+            context=extract(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": path},
+        ) as span:
+
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    span.set_attribute("http.response.status_code", status)
+                    if status >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+__all__ = [
+    "Tracing",
+    "TracingMiddleware",
+    "configure_tracing",
+    "shutdown_tracing",
+    "start_span",
+]
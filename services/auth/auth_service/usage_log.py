@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Union
+
+from .state import Reservation
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_PREFIX = "usage-"
+_SEGMENT_SUFFIX = ".log"
+_SNAPSHOT_NAME = "usage.snapshot"
+
+
+@dataclass(frozen=True)
+class UsageRecord:
+    key_id: str
+    balance: int
+    used: int
+
+
+@dataclass
+class _Rotate:
+    done: threading.Event
+    segment: Optional[int] = None
+
+
+class _Stop:
+    pass
+
+
+_Item = Union[tuple[str, int, int], str, _Rotate, _Stop]
+
+
+def _segment_number(path: Path) -> Optional[int]:
+    name = path.name
+    if not (name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)):
+        return None
+    try:
+        return int(name[len(_SEGMENT_PREFIX) : -len(_SEGMENT_SUFFIX)])
+    except ValueError:
+        return None
+
+
+class UsageLog:
+    # Write-ahead log of absolute wallet states and of quota holds. Wallet records are
+    # last-writer-wins per key and holds are added and released by reservation id, so
+    # replaying the log tail over a snapshot is idempotent. A writer thread group-commits
+    # whatever accumulated during flush_interval_seconds with a single fsync; a crash can
+    # lose at most that window. Callers wait at most timeout_seconds on the writer.
+    def __init__(
+        self,
+        directory: Path,
+        flush_interval_seconds: float = 0.005,
+        timeout_seconds: float = 30.0,
+    ) -> None:
+        self._directory = directory
+        self._flush_interval = flush_interval_seconds
+        self._timeout = timeout_seconds
+        self._queue: queue.SimpleQueue[_Item] = queue.SimpleQueue()
+        self._segment = 0
+        self._handle = None
+        self._thread: Optional[threading.Thread] = None
+        self._records = 0
+        self._commits = 0
+
+    def _segment_path(self, segment: int) -> Path:
+        return self._directory / f"{_SEGMENT_PREFIX}{segment:010d}{_SEGMENT_SUFFIX}"
+
+    def _segments(self) -> list[tuple[int, Path]]:
+        found = []
+        for path in self._directory.iterdir():
+            number = _segment_number(path)
+            if number is not None:
+                found.append((number, path))
+        return sorted(found)
+
+    def recover(self) -> tuple[Dict[str, UsageRecord], Dict[str, Reservation]]:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        state: Dict[str, UsageRecord] = {}
+        holds: Dict[str, Reservation] = {}
+        first_segment = 0
+        snapshot_path = self._directory / _SNAPSHOT_NAME
+        if snapshot_path.exists():
+            data = json.loads(snapshot_path.read_text())
+            first_segment = int(data["segment"])
+            for key_id, (balance, used) in data["state"].items():
+                state[key_id] = UsageRecord(key_id=key_id, balance=int(balance), used=int(used))
+            for reservation_id, (key_id, amount, expires_at) in data.get("holds", {}).items():
+                holds[reservation_id] = Reservation(
+                    reservation_id, key_id, int(amount), float(expires_at)
+                )
+        last_segment = first_segment
+        for number, path in self._segments():
+            last_segment = max(last_segment, number)
+            if number < first_segment:
+                continue
+            with path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    self._replay(line, state, holds)
+        self._segment = last_segment + 1
+        return state, holds
+
+    @staticmethod
+    def _replay(line: str, state: Dict[str, UsageRecord], holds: Dict[str, Reservation]) -> None:
+        # A torn final line from a crash is skipped.
+        if not line.endswith("\n"):
+            return
+        parts = line.rstrip("\n").split("\t")
+        try:
+            if len(parts) == 3:
+                state[parts[0]] = UsageRecord(
+                    key_id=parts[0], balance=int(parts[1]), used=int(parts[2])
+                )
+            elif len(parts) == 5 and parts[0] == "hold":
+                holds[parts[1]] = Reservation(parts[1], parts[2], int(parts[3]), float(parts[4]))
+            elif len(parts) == 2 and parts[0] == "release":
+                holds.pop(parts[1], None)
+        except ValueError:
+            return
+
+    def start(self) -> None:
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._handle = self._segment_path(self._segment).open("a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="usage-log-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, key_id: str, balance: int, used: int) -> None:
+        self._queue.put((key_id, balance, used))
+
+    def append_hold(self, hold: Reservation) -> None:
+        self._queue.put(
+            "hold\t%s\t%s\t%d\t%r\n"
+            % (hold.reservation_id, hold.key_id, hold.amount, hold.expires_at)
+        )
+
+    def append_release(self, reservation_id: str) -> None:
+        self._queue.put("release\t%s\n" % reservation_id)
+
+    def snapshot(
+        self,
+        export: Callable[[], Dict[str, tuple[int, int]]],
+        export_holds: Callable[[], Iterable[Reservation]] = list,
+    ) -> int:
+        # Rotate first, then export: every mutation missing from the export is logged in
+        # the new segment, and every record in older segments is covered by the export.
+        if self._thread is None:
+            raise RuntimeError("Usage log is not running")
+        rotate = _Rotate(done=threading.Event())
+        self._queue.put(rotate)
+        if not rotate.done.wait(self._timeout):
+            raise OSError("Usage log segment rotation timed out")
+        if rotate.segment is None:
+            raise OSError("Usage log segment rotation failed")
+        state = export()
+        holds = export_holds()
+        payload = json.dumps(
+            {
+                "segment": rotate.segment,
+                "state": {key_id: [balance, used] for key_id, (balance, used) in state.items()},
+                "holds": {
+                    hold.reservation_id: [hold.key_id, hold.amount, hold.expires_at]
+                    for hold in holds
+                },
+            },
+            separators=(",", ":"),
+        )
+        fd, tmp_name = tempfile.mkstemp(dir=self._directory, prefix=f".{_SNAPSHOT_NAME}.")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(payload)
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_name, self._directory / _SNAPSHOT_NAME)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        for number, path in self._segments():
+            if number < rotate.segment:
+                path.unlink(missing_ok=True)
+        return len(state)
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(_Stop())
+        self._thread.join(self._timeout)
+        if self._thread.is_alive():
+            logger.error("Usage log writer did not stop", extra={"segment": self._segment})
+        self._thread = None
+
+    def stats(self) -> dict[str, int]:
+        return {"records": self._records, "commits": self._commits, "segment": self._segment}
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            items = [self._queue.get()]
+            if self._flush_interval > 0:
+                time.sleep(self._flush_interval)
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines: list[str] = []
+            for item in items:
+                if type(item) is tuple:
+                    lines.append("%s\t%d\t%d\n" % item)
+                elif type(item) is str:
+                    lines.append(item)
+                elif isinstance(item, _Rotate):
+                    self._commit(lines)
+                    lines = []
+                    self._rotate(item)
+                else:
+                    stopping = True
+            self._commit(lines)
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+    def _commit(self, lines: list[str]) -> None:
+        if not lines or self._handle is None:
+            return
+        try:
+            self._handle.writelines(lines)
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+        except OSError:
+            logger.exception("Failed to commit usage log batch", extra={"records": len(lines)})
+            return
+        self._records += len(lines)
+        self._commits += 1
+
+    def _rotate(self, rotate: _Rotate) -> None:
+        # Open the next segment before closing the current one, so a failure leaves the
+        # writer appending to a live handle and the snapshot is skipped, not the thread.
+        try:
+            handle = self._segment_path(self._segment + 1).open("a", encoding="utf-8")
+        except OSError:
+            logger.exception("Failed to rotate usage log", extra={"segment": self._segment + 1})
+            rotate.done.set()
+            return
+        previous, self._handle = self._handle, handle
+        self._segment += 1
+        rotate.segment = self._segment
+        rotate.done.set()
+        if previous is not None:
+            try:
+                previous.close()
+            except OSError:
+                logger.exception("Failed to close usage log segment")
+
+
+__all__ = ["UsageLog", "UsageRecord"]
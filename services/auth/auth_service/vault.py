@@ -3,15 +3,24 @@ from __future__ import annotations
 import asyncio
 import hmac
 import logging
+import time
 from dataclasses import dataclass
-from typing import Optional
+from datetime import datetime
+from typing import Dict, Optional
 
+from aiohttp import ClientSession, DummyCookieJar, TCPConnector
+from azure.core.credentials_async import AsyncTokenCredential
 from azure.core.exceptions import ResourceNotFoundError
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.identity.aio import DefaultAzureCredential
+from azure.keyvault.secrets.aio import SecretClient
 
 from .config import Settings, TokenParts
-from .state import SecretCache
+from .limits import RATE_LIMITS_TAG, KeyLimits, parse_key_limits
+from .metrics import KEY_VAULT_DURATION, KEY_VAULT_ERRORS
+from .state import SecretCache, SingleFlight
+from .timing import record_phase
+from .tracing import start_span
 
 logger = logging.getLogger(__name__)
 
@@ -20,24 +29,80 @@ logger = logging.getLogger(__name__)
 class SecretMatch:
     secret_value: Optional[str]
     matched: bool
+    limits: Optional[KeyLimits] = None
 
 
-def create_secret_client(settings: Settings) -> SecretClient:
+def create_credential(settings: Settings) -> DefaultAzureCredential:
     credential_kwargs: dict[str, str] = {}
     if settings.managed_identity_client_id:
         credential_kwargs["managed_identity_client_id"] = settings.managed_identity_client_id
-    credential = DefaultAzureCredential(**credential_kwargs)
-    return SecretClient(vault_url=settings.key_vault_url, credential=credential)
+    return DefaultAzureCredential(**credential_kwargs)
+
+
+def create_secret_client(settings: Settings, credential: AsyncTokenCredential) -> SecretClient:
+    # Must be called from a running event loop; the client owns the session and
+    # closes it (and the pooled connections) in SecretClient.close().
+    connector = TCPConnector(
+        limit=settings.key_vault_max_connections,
+        limit_per_host=settings.key_vault_max_connections,
+    )
+    session = ClientSession(
+        connector=connector,
+        cookie_jar=DummyCookieJar(),
+        auto_decompress=False,
+        trust_env=True,
+    )
+    transport = AioHttpTransport(session=session, session_owner=True)
+    return SecretClient(
+        vault_url=settings.key_vault_url,
+        credential=credential,
+        transport=transport,
+    )
 
 
 def secret_name(prefix: str, key_id: str) -> str:
     return f"{prefix}-api-key-{key_id}"
 
 
-def _match_secret(stored: Optional[str], provided: str) -> SecretMatch:
+def _match_secret(
+    stored: Optional[str], provided: str, limits: Optional[KeyLimits] = None
+) -> SecretMatch:
     if stored is None:
         return SecretMatch(secret_value=None, matched=False)
-    return SecretMatch(secret_value=stored, matched=hmac.compare_digest(stored, provided))
+    return SecretMatch(
+        secret_value=stored,
+        matched=hmac.compare_digest(stored, provided),
+        limits=limits,
+    )
+
+
+async def _fetch_secret(
+    client: SecretClient, cache: SecretCache, name: str
+) -> tuple[Optional[str], Optional[KeyLimits]]:
+    with start_span("key_vault.get_secret", {"key_vault.secret_name": name}) as span:
+        start = time.perf_counter()
+        try:
+            secret = await client.get_secret(name)
+        except ResourceNotFoundError:
+            KEY_VAULT_DURATION.observe(time.perf_counter() - start, "not_found")
+            if span is not None:
+                span.set_attribute("key_vault.found", False)
+            cache.set(name, None)
+            return None, None
+        except Exception as exc:
+            KEY_VAULT_DURATION.observe(time.perf_counter() - start, "error")
+            KEY_VAULT_ERRORS.inc()
+            logger.exception("Key Vault lookup failed", extra={"secret_name": name})
+            raise RuntimeError("Key Vault lookup failed") from exc
+        KEY_VAULT_DURATION.observe(time.perf_counter() - start, "found")
+        if span is not None:
+            span.set_attribute("key_vault.found", True)
+
+    value = secret.value or None
+    tags = secret.properties.tags or {}
+    limits = parse_key_limits(tags.get(RATE_LIMITS_TAG)) if value is not None else None
+    cache.set(name, value, limits)
+    return value, limits
 
 
 async def validate_token(
@@ -45,24 +110,173 @@ async def validate_token(
     token_parts: TokenParts,
     client: SecretClient,
     cache: SecretCache,
+    lookups: Optional[SingleFlight] = None,
+    outage_grace_seconds: float = 0,
 ) -> SecretMatch:
-    name = secret_name(token_parts.prefix, token_parts.key_id)
-    hit, cached = cache.get(name)
-    if hit:
-        return _match_secret(cached, token_parts.secret)
-
-    try:
-        secret = await asyncio.to_thread(client.get_secret, name)
-    except ResourceNotFoundError:
-        cache.set(name, None)
-        return SecretMatch(secret_value=None, matched=False)
-    except Exception as exc:
-        logger.exception("Key Vault lookup failed", extra={"secret_name": name})
-        raise RuntimeError("Key Vault lookup failed") from exc
+    with start_span("validate_token", {"auth.key_id": token_parts.key_id}) as span:
+        start = time.perf_counter_ns()
+        name = secret_name(token_parts.prefix, token_parts.key_id)
+        hit, cached, stale, limits = cache.lookup(name)
+        if span is not None:
+            span.set_attribute("auth.cache_hit", hit)
+            span.set_attribute("auth.cache_stale", stale)
+        if hit and stale and lookups is not None:
+            # Serve the stale value now and refresh it in the background; failures keep
+            # serving stale until the hard TTL expires the entry.
+            lookups.spawn(name, lambda: _fetch_secret(client, cache, name))
+        if hit:
+            record_phase("cache", start)
+            return _match_secret(cached, token_parts.secret, limits)
+
+        digests = cache.digests
+        if digests is not None:
+            matched, limits = digests.verify(name, token_parts.secret, cache.ttl_seconds)
+            if matched:
+                record_phase("cache", start)
+                return SecretMatch(secret_value=None, matched=True, limits=limits)
+        record_phase("cache", start)
+
+        start = time.perf_counter_ns()
+        try:
+            if lookups is None:
+                value, limits = await _fetch_secret(client, cache, name)
+            else:
+                value, limits = await lookups.run(
+                    name, lambda: _fetch_secret(client, cache, name)
+                )
+        except RuntimeError:
+            if digests is None:
+                raise
+            matched, limits = digests.verify(name, token_parts.secret, outage_grace_seconds)
+            if not matched:
+                raise
+            logger.warning(
+                "Authorized from known key digest during Key Vault outage",
+                extra={"secret_name": name},
+            )
+            return SecretMatch(secret_value=None, matched=True, limits=limits)
+        finally:
+            record_phase("vault", start)
+        return _match_secret(value, token_parts.secret, limits)
+
+
+async def _load_secrets(
+    names: list[str],
+    *,
+    client: SecretClient,
+    cache: SecretCache,
+    lookups: SingleFlight,
+    concurrency: int,
+) -> list[str]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(name: str) -> bool:
+        async with semaphore:
+            try:
+                await lookups.run(name, lambda: _fetch_secret(client, cache, name))
+            except RuntimeError:
+                return False
+            return True
+
+    loaded = await asyncio.gather(*(load(name) for name in names))
+    return [name for name, ok in zip(names, loaded) if ok]
+
+
+async def prewarm_cache(
+    *,
+    prefix: str,
+    client: SecretClient,
+    cache: SecretCache,
+    lookups: SingleFlight,
+    concurrency: int,
+) -> int:
+    name_prefix = secret_name(prefix, "")
+    names = [
+        props.name
+        async for props in client.list_properties_of_secrets()
+        if props.name and props.name.startswith(name_prefix) and props.enabled is not False
+    ]
+    await _load_secrets(names, client=client, cache=cache, lookups=lookups, concurrency=concurrency)
+    return len(names)
+
+
+@dataclass(frozen=True)
+class SecretVersion:
+    version: Optional[str]
+    updated_on: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class SyncResult:
+    fetched: int
+    revoked: int
+    unchanged: int
+
+
+class VaultSync:
+    def __init__(
+        self,
+        *,
+        prefix: str,
+        client: SecretClient,
+        cache: SecretCache,
+        lookups: SingleFlight,
+        concurrency: int,
+    ) -> None:
+        self._name_prefix = secret_name(prefix, "")
+        self._client = client
+        self._cache = cache
+        self._lookups = lookups
+        self._concurrency = concurrency
+        self._known: Dict[str, SecretVersion] = {}
+
+    async def sync_once(self) -> SyncResult:
+        listed: Dict[str, SecretVersion] = {}
+        revoked: list[str] = []
+        async for props in self._client.list_properties_of_secrets():
+            name = props.name
+            if not name or not name.startswith(self._name_prefix):
+                continue
+            if props.enabled is False:
+                revoked.append(name)
+                continue
+            listed[name] = SecretVersion(version=props.version, updated_on=props.updated_on)
+
+        # Anything we knew about that is now disabled or gone is revoked: cache a
+        # negative entry so requests fail closed without a Key Vault round trip.
+        revoked.extend(name for name in self._known if name not in listed)
+        for name in revoked:
+            self._known.pop(name, None)
+            self._cache.set(name, None)
 
-    value = secret.value or ""
-    cache.set(name, value or None)
-    return _match_secret(value or None, token_parts.secret)
+        changed: list[str] = []
+        unchanged = 0
+        for name, version in listed.items():
+            if self._known.get(name) == version and self._cache.touch(name):
+                unchanged += 1
+            else:
+                changed.append(name)
+        loaded = await _load_secrets(
+            changed,
+            client=self._client,
+            cache=self._cache,
+            lookups=self._lookups,
+            concurrency=self._concurrency,
+        )
+        # Failed fetches stay unknown so the next pass retries them.
+        for name in loaded:
+            self._known[name] = listed[name]
+        return SyncResult(fetched=len(loaded), revoked=len(revoked), unchanged=unchanged)
 
 
-__all__ = ["SecretMatch", "create_secret_client", "secret_name", "validate_token"]
+__all__ = [
+    "SecretMatch",
+    "SecretVersion",
+    "SyncResult",
+    "VaultSync",
+    "create_credential",
+    "create_secret_client",
+    "prewarm_cache",
+    "secret_name",
+    "validate_token",
+]
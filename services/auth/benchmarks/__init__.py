@@ -0,0 +1 @@
+"""Benchmarks for the auth service (run from services/auth with ``python -m benchmarks.<name>``)."""
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from typing import Any, Iterable, Optional
+
+from azure.core.credentials import AccessToken
+from azure.core.pipeline.transport import AsyncHttpTransport, HttpTransport
+from azure.core.rest._http_response_impl import RestHttpClientTransportResponse
+from azure.core.rest._http_response_impl_async import RestAsyncHttpClientTransportResponse
+
+VAULT_URL = "https://bench.vault.azure.net"
+_CHALLENGE = (
+    'Bearer authorization="https://login.microsoftonline.com/'
+    '00000000-0000-0000-0000-000000000000", '
+    'resource="https://vault.azure.net"'
+)
+
+
+class _RawResponse:
+    def __init__(self, status: int, body: bytes, headers: Iterable[tuple[str, str]]) -> None:
+        self.status = status
+        self.reason = "OK" if status < 400 else "Error"
+        self._body = body
+        self._headers = list(headers)
+
+    def getheaders(self) -> list[tuple[str, str]]:
+        return self._headers
+
+    def read(self) -> bytes:
+        return self._body
+
+
+class StubVault:
+    """In-memory secret store answering Key Vault REST requests."""
+
+    def __init__(
+        self,
+        secrets: Optional[dict[str, str]] = None,
+        tags: Optional[dict[str, dict[str, str]]] = None,
+    ) -> None:
+        self.secrets: dict[str, str] = dict(secrets or {})
+        self.tags: dict[str, dict[str, str]] = dict(tags or {})
+        self.calls = 0
+
+    def respond(self, request) -> _RawResponse:
+        if "Authorization" not in request.headers:
+            return _RawResponse(401, b"", [("WWW-Authenticate", _CHALLENGE)])
+        self.calls += 1
+        path = request.url.split("?", 1)[0].rstrip("/")
+        if path.endswith("/secrets"):
+            return self._list()
+        name = path.split("/secrets/", 1)[-1].split("/", 1)[0]
+        value = self.secrets.get(name)
+        if value is None:
+            body = json.dumps({"error": {"code": "SecretNotFound", "message": name}})
+            return _RawResponse(404, body.encode(), [("Content-Type", "application/json")])
+        body = json.dumps(
+            {
+                "value": value,
+                "id": f"{VAULT_URL}/secrets/{name}/0000000000000000",
+                "attributes": {"enabled": True, "created": 0, "updated": 0},
+                "tags": self.tags.get(name),
+            }
+        )
+        return _RawResponse(200, body.encode(), [("Content-Type", "application/json")])
+
+    def _list(self) -> _RawResponse:
+        items = [
+            {
+                "id": f"{VAULT_URL}/secrets/{name}",
+                "attributes": {"enabled": True, "created": 0, "updated": 0},
+            }
+            for name in self.secrets
+        ]
+        body = json.dumps({"value": items, "nextLink": None})
+        return _RawResponse(200, body.encode(), [("Content-Type", "application/json")])
+
+
+class StubTransport(HttpTransport):
+    def __init__(self, vault: StubVault, latency_seconds: float = 0.0) -> None:
+        self._vault = vault
+        self._latency = latency_seconds
+
+    def send(self, request, **kwargs):
+        if self._latency:
+            time.sleep(self._latency)
+        response = RestHttpClientTransportResponse(
+            request=request, internal_response=self._vault.respond(request)
+        )
+        response.read()
+        return response
+
+    def open(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+class AsyncStubTransport(AsyncHttpTransport):
+    def __init__(self, vault: StubVault, latency_seconds: float = 0.0) -> None:
+        self._vault = vault
+        self._latency = latency_seconds
+
+    async def send(self, request, **kwargs):
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        response = RestAsyncHttpClientTransportResponse(
+            request=request, internal_response=self._vault.respond(request)
+        )
+        await response.read()
+        return response
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+class StubCredential:
+    def get_token(self, *scopes, **kwargs) -> AccessToken:
+        return AccessToken("bench-token", int(time.time()) + 3600)
+
+    def close(self) -> None:
+        pass
+
+
+class AsyncStubCredential:
+    async def get_token(self, *scopes, **kwargs) -> AccessToken:
+        return AccessToken("bench-token", int(time.time()) + 3600)
+
+    async def close(self) -> None:
+        pass
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def drive_asgi(app: Any, path: str, requests: int, method: str = "POST") -> float:
+    # Requests per second through the ASGI callable alone: no server, no sockets.
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80),
+    }
+    statuses: list[int] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    for _ in range(min(requests, 1000)):
+        await app(scope, receive, send)
+    statuses.clear()
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(scope, receive, send)
+    elapsed = time.perf_counter() - start
+    assert statuses == [200] * requests
+    return requests / elapsed
+
+
+def summarize(samples_seconds: list[float]) -> dict[str, float]:
+    ms = [sample * 1000.0 for sample in samples_seconds]
+    return {
+        "count": len(ms),
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "p999_ms": round(percentile(ms, 99.9), 3),
+        "max_ms": round(max(ms) if ms else 0.0, 3),
+    }
+
+
+__all__ = [
+    "AsyncStubCredential",
+    "AsyncStubTransport",
+    "StubCredential",
+    "StubTransport",
+    "StubVault",
+    "VAULT_URL",
+    "drive_asgi",
+    "percentile",
+    "summarize",
+]
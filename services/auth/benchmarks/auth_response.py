@@ -0,0 +1,70 @@
+"""Requests per core for the AuthResponse path: response_model serialization vs. cached bytes."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+
+from fastapi import FastAPI, Response
+
+from auth_service.auth import build_user
+from auth_service.limits import parse_key_limits
+from auth_service.models import AuthResponse
+from auth_service.responses import ResponseCache
+
+from ._stubs import drive_asgi
+
+_RULES = json.dumps(
+    {"SEARCH": [{"occurrence": 10, "periodSeconds": 1}, {"occurrence": 500, "periodSeconds": 3600}]}
+)
+
+
+def _app(keys: int, with_limits: bool) -> FastAPI:
+    app = FastAPI()
+    limits = parse_key_limits(_RULES) if with_limits else None
+    cache = ResponseCache(keys)
+    counter = iter(range(1 << 62))
+
+    @app.post("/model", response_model=AuthResponse, response_model_exclude_none=True)
+    async def model() -> AuthResponse:
+        index = next(counter)
+        user = build_user(
+            key_id=f"bench{index % keys:06d}",
+            balance=1_000_000 - index,
+            used=index,
+            custom_rate_limits=limits.rules if limits else None,
+        )
+        return AuthResponse(data=user)
+
+    @app.post("/bytes", response_model=AuthResponse, response_model_exclude_none=True)
+    async def cached() -> Response:
+        index = next(counter)
+        body = cache.render(f"bench{index % keys:06d}", 1_000_000 - index, index, limits)
+        return Response(content=body, media_type="application/json")
+
+    return app
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--keys", type=int, default=1_000)
+    args = parser.parse_args()
+
+    results: dict[str, object] = {"requests": args.requests, "keys": args.keys}
+    for with_limits in (False, True):
+        app = _app(args.keys, with_limits)
+        model_rps = asyncio.run(drive_asgi(app, "/model", args.requests))
+        bytes_rps = asyncio.run(drive_asgi(app, "/bytes", args.requests))
+        results["with_limits" if with_limits else "plain"] = {
+            "response_model_rps": round(model_rps),
+            "cached_bytes_rps": round(bytes_rps),
+            "speedup": round(bytes_rps / model_rps, 2),
+        }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
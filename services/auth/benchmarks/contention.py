@@ -0,0 +1,85 @@
+"""Throughput of the shared state structures under thread contention, by shard count.
+
+Scaling beyond one shard needs a free-threaded interpreter (python3.13t); under the GIL
+the numbers mostly show the per-call overhead of striping.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from typing import Callable
+
+from auth_service.state import SecretCache, UsageTracker, create_rate_limiter
+
+
+def _operations(shards: int, keys: list[str]) -> dict[str, Callable[[str], object]]:
+    cache = SecretCache(300, max_entries=len(keys), shards=shards)
+    for key in keys:
+        cache.set(key, "value")
+    limiter = create_rate_limiter("gcra", 1_000_000, shards)
+    tracker = UsageTracker(1_000_000_000, shards)
+    return {
+        "secret_cache": cache.lookup,
+        "rate_limiter": limiter.allow,
+        "usage_tracker": lambda key: tracker.consume(key, 1),
+    }
+
+
+def _throughput(
+    operation: Callable[[str], object], keys: list[str], threads: int, ops: int
+) -> float:
+    barrier = threading.Barrier(threads + 1)
+    per_thread = ops // threads
+
+    def worker(seed: int) -> None:
+        rng = random.Random(seed)
+        sample = [keys[rng.randrange(len(keys))] for _ in range(per_thread)]
+        barrier.wait()
+        for key in sample:
+            operation(key)
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def run(shard_counts: list[int], threads: int, keys: int, ops: int) -> dict:
+    key_ids = [f"key{index:07d}" for index in range(keys)]
+    results = []
+    for shards in shard_counts:
+        for name, operation in _operations(shards, key_ids).items():
+            results.append(
+                {
+                    "structure": name,
+                    "shards": shards,
+                    "threads": threads,
+                    "ops_per_second": round(_throughput(operation, key_ids, threads, ops)),
+                }
+            )
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    return {"gil_enabled": gil, "results": results}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--ops", type=int, default=400_000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.shards, args.threads, args.keys, args.ops), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
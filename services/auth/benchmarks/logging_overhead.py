@@ -0,0 +1,148 @@
+"""Requests per second under uvicorn with access logging off, text, JSON, queued and sampled."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+import aiohttp
+from fastapi import FastAPI
+
+from auth_service.logging import configure_logging
+
+# mode -> (access log, format, queued, sample rate)
+MODES: dict[str, tuple[bool, str, bool, float]] = {
+    "off": (False, "text", False, 1.0),
+    "text": (True, "text", False, 1.0),
+    "json": (True, "json", False, 1.0),
+    "json_queued": (True, "json", True, 1.0),
+    "json_queued_sampled": (True, "json", True, 0.1),
+}
+
+
+def _app(fmt: str, queued: bool, sample_rate: float) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # The queue listener drains at exit, after uvicorn's own shutdown lines.
+        configure_logging("INFO", fmt=fmt, queued=queued, access_sample_rate=sample_rate)
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/ping")
+    async def ping() -> dict[str, str]:
+        return {"status": "ok"}
+
+    return app
+
+
+def _serve(mode: str, port: int) -> int:
+    import uvicorn
+
+    access_log, fmt, queued, sample_rate = MODES[mode]
+    uvicorn.run(
+        _app(fmt, queued, sample_rate),
+        host="127.0.0.1",
+        port=port,
+        log_level="info",
+        access_log=access_log,
+    )
+    return 0
+
+
+async def _wait_ready(session: aiohttp.ClientSession, url: str) -> None:
+    deadline = time.monotonic() + 10.0
+    while True:
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                return
+        except aiohttp.ClientError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+
+
+async def _load(port: int, requests: int, concurrency: int) -> float:
+    url = f"http://127.0.0.1:{port}/ping"
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await _wait_ready(session, url)
+        remaining = requests
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                async with session.get(url) as response:
+                    await response.read()
+                    assert response.status == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+def _measure(mode: str, port: int, requests: int, concurrency: int) -> dict[str, float]:
+    with tempfile.TemporaryFile() as log:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.logging_overhead",
+                "--serve",
+                mode,
+                "--port",
+                str(port),
+            ],
+            stdout=log,
+            stderr=log,
+            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+        )
+        try:
+            rps = asyncio.run(_load(port, requests, concurrency))
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+        log.seek(0)
+        lines = sum(1 for _ in log)
+    return {"rps": round(rps), "log_lines": lines}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--serve", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return _serve(args.serve, args.port)
+
+    # Interleave the modes across rounds and keep each mode's best run, so machine noise
+    # does not land on one mode.
+    results: dict[str, object] = {"requests": args.requests, "concurrency": args.concurrency}
+    for _ in range(args.rounds):
+        for mode in MODES:
+            run = _measure(mode, args.port, args.requests, args.concurrency)
+            best = results.get(mode)
+            if best is None or run["rps"] > best["rps"]:  # type: ignore[index]
+                results[mode] = run
+    baseline = results["off"]["rps"]  # type: ignore[index]
+    for mode in MODES:
+        entry = results[mode]
+        entry["overhead_pct"] = round((1 - entry["rps"] / baseline) * 100, 1)  # type: ignore[index]
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
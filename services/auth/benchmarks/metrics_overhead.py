@@ -0,0 +1,70 @@
+"""Per-request cost of MetricsMiddleware and of the raw instruments."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI
+
+from auth_service.metrics import MetricsMiddleware, Registry
+
+from ._stubs import drive_asgi
+
+
+def _app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/healthz")
+    async def healthz() -> dict[str, str]:
+        return {"status": "ok"}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+def _instrument_ns(iterations: int) -> dict[str, float]:
+    registry = Registry()
+    histogram = registry.histogram("bench_seconds", "Bench.", ("endpoint",))
+    counter = registry.counter("bench_total", "Bench.", ("endpoint", "status"))
+    start = time.perf_counter_ns()
+    for index in range(iterations):
+        histogram.observe((index % 1000) / 100_000.0, "/authorization")
+    observe = (time.perf_counter_ns() - start) / iterations
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        counter.inc("/authorization", "200")
+    inc = (time.perf_counter_ns() - start) / iterations
+    return {"histogram_observe_ns": round(observe, 1), "counter_inc_ns": round(inc, 1)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    # Interleave runs so drift in CPU frequency hits both variants alike.
+    plain: list[float] = []
+    instrumented: list[float] = []
+    for _ in range(3):
+        plain.append(asyncio.run(drive_asgi(_app(False), "/healthz", args.requests, "GET")))
+        instrumented.append(asyncio.run(drive_asgi(_app(True), "/healthz", args.requests, "GET")))
+    plain_rps = max(plain)
+    instrumented_rps = max(instrumented)
+    results = {
+        "requests": args.requests,
+        "plain_rps": round(plain_rps),
+        "instrumented_rps": round(instrumented_rps),
+        "overhead_us_per_request": round((1 / instrumented_rps - 1 / plain_rps) * 1e6, 2),
+        **_instrument_ns(args.iterations),
+    }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
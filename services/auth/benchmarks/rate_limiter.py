@@ -0,0 +1,70 @@
+"""Memory and decisions/sec of the deque (window) and GCRA rate limiter engines."""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from auth_service.state import create_rate_limiter
+
+
+def _populate(engine: str, keys: list[str], limit: int, hits_per_key: int) -> tuple[object, int]:
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    limiter = create_rate_limiter(engine, limit)
+    for _ in range(hits_per_key):
+        for key in keys:
+            limiter.allow(key)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return limiter, after - before
+
+
+def _decisions_per_second(limiter, keys: list[str], decisions: int) -> float:
+    rng = random.Random(0)
+    sample = [keys[rng.randrange(len(keys))] for _ in range(decisions)]
+    allow = limiter.allow
+    start = time.perf_counter()
+    for key in sample:
+        allow(key)
+    return decisions / (time.perf_counter() - start)
+
+
+def run(key_counts: list[int], limit: int, hits_per_key: int, decisions: int) -> list[dict]:
+    results = []
+    for count in key_counts:
+        keys = [f"key{index:08d}" for index in range(count)]
+        for engine in ("window", "gcra"):
+            limiter, memory = _populate(engine, keys, limit, hits_per_key)
+            results.append(
+                {
+                    "engine": engine,
+                    "keys": count,
+                    "hits_per_key": hits_per_key,
+                    "memory_bytes": memory,
+                    "bytes_per_key": round(memory / count, 1),
+                    "decisions_per_second": round(_decisions_per_second(limiter, keys, decisions)),
+                }
+            )
+            del limiter
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--keys", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--limit", type=int, default=10_000)
+    parser.add_argument("--hits-per-key", type=int, default=10)
+    parser.add_argument("--decisions", type=int, default=500_000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.keys, args.limit, args.hits_per_key, args.decisions), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
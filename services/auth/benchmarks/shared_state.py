@@ -0,0 +1,186 @@
+"""Correctness and latency of the Redis state backend against a Redis-compatible server.
+
+Two backend instances stand in for two replicas sharing one server. Point --url at a
+throwaway database (redis-server, valkey, or any RESP-compatible stand-in); the run
+writes under a random key prefix.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from auth_service.backends import LocalStateBackend, RedisStateBackend
+from auth_service.state import (
+    GcraRateLimiter,
+    LeaseTable,
+    MultiWindowLimiter,
+    ReservationBook,
+    ResultCache,
+    UsageTracker,
+)
+
+from ._stubs import summarize
+
+
+def _replicas(
+    url: str, max_connections: int, prefix: str, balance: int, limit: int
+) -> list[RedisStateBackend]:
+    return [
+        RedisStateBackend.from_url(
+            url,
+            max_connections=max_connections,
+            key_prefix=prefix,
+            default_balance=balance,
+            limit_per_minute=limit,
+            idempotency_ttl_seconds=60,
+            lease_ttl_seconds=60,
+        )
+        for _ in range(2)
+    ]
+
+
+async def _check_quota(url: str, max_connections: int, concurrency: int) -> dict:
+    balance = concurrency // 2
+    replicas = _replicas(url, max_connections, f"bench-{uuid.uuid4().hex}", balance, 0)
+    results = await asyncio.gather(
+        *(replicas[index % 2].report("quota-key", 1) for index in range(concurrency))
+    )
+    final = (await replicas[0].authorize("quota-key")).usage_state
+    for replica in replicas:
+        await replica.close()
+    charged = sum(1 for _, _, out_of_quota, _ in results if not out_of_quota)
+    return {
+        "requests": concurrency,
+        "balance": balance,
+        "charged": charged,
+        "final_used": final.used,
+        "correct": charged == balance and final.balance == 0 and final.used == concurrency,
+    }
+
+
+async def _check_idempotency(url: str, max_connections: int, concurrency: int) -> dict:
+    replicas = _replicas(url, max_connections, f"bench-{uuid.uuid4().hex}", 10**9, 0)
+    results = await asyncio.gather(
+        *(
+            replicas[index % 2].report("idem-key", 7, f"retry-{index % 10}")
+            for index in range(concurrency)
+        )
+    )
+    final = (await replicas[0].authorize("idem-key")).usage_state
+    for replica in replicas:
+        await replica.close()
+    replays = sum(1 for *_, replayed in results if replayed)
+    return {
+        "requests": len(results),
+        "distinct_keys": 10,
+        "final_used": final.used,
+        "replays": replays,
+        "correct": final.used == 70 and replays == len(results) - 10,
+    }
+
+
+async def _check_rate_limit(url: str, max_connections: int, limit: int) -> dict:
+    replicas = _replicas(url, max_connections, f"bench-{uuid.uuid4().hex}", 10**9, limit)
+    results = await asyncio.gather(
+        *(replicas[index % 2].authorize("rate-key") for index in range(limit * 3))
+    )
+    for replica in replicas:
+        await replica.close()
+    allowed = sum(1 for admission in results if admission.rejected is None)
+    return {"requests": limit * 3, "limit": limit, "allowed": allowed, "correct": allowed == limit}
+
+
+async def _check_leases(url: str, max_connections: int, limit: int) -> dict:
+    # Fill the cap from both replicas at once, release half, then race for the freed slots.
+    replicas = _replicas(url, max_connections, f"bench-{uuid.uuid4().hex}", 10**9, 0)
+
+    async def acquire(count: int) -> int:
+        results = await asyncio.gather(
+            *(
+                replicas[index % 2].authorize("lease-key", lease_limit=limit)
+                for index in range(count)
+            )
+        )
+        return sum(1 for admission in results if admission.rejected is None)
+
+    first = await acquire(limit * 3)
+    released = limit // 2
+    await asyncio.gather(
+        *(replicas[index % 2].release_lease("lease-key") for index in range(released))
+    )
+    second = await acquire(limit * 3)
+    for replica in replicas:
+        await replica.close()
+    return {
+        "limit": limit,
+        "acquired": first,
+        "reacquired": second,
+        "correct": first == limit and second == released,
+    }
+
+
+async def _latency(backend, requests: int, concurrency: int) -> dict:
+    samples: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await backend.report(f"key{index % 1000}", 1)
+            samples.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    return summarize(samples)
+
+
+async def run(
+    url: str, max_connections: int, concurrency: int, limit: int, requests: int
+) -> dict:
+    local = LocalStateBackend(
+        UsageTracker(10**9),
+        GcraRateLimiter(0),
+        ReservationBook(),
+        ResultCache(60, 1000),
+        ResultCache(60, 1000),
+        MultiWindowLimiter(),
+        LeaseTable(60),
+    )
+    redis_backend = _replicas(url, max_connections, f"bench-{uuid.uuid4().hex}", 10**9, 10**6)[0]
+    try:
+        latency = {
+            "local": await _latency(local, requests, concurrency),
+            "redis": await _latency(redis_backend, requests, concurrency),
+        }
+    finally:
+        await redis_backend.close()
+    return {
+        "quota": await _check_quota(url, max_connections, concurrency),
+        "idempotency": await _check_idempotency(url, max_connections, concurrency),
+        "rate_limit": await _check_rate_limit(url, max_connections, limit),
+        "leases": await _check_leases(url, max_connections, limit),
+        "report_latency": latency,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--max-connections", type=int, default=64)
+    args = parser.parse_args()
+    results = asyncio.run(
+        run(args.url, args.max_connections, args.concurrency, args.limit, args.requests)
+    )
+    print(json.dumps(results, indent=2))
+    checks = ("quota", "idempotency", "rate_limit", "leases")
+    return 0 if all(results[check]["correct"] for check in checks) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,412 @@
+"""Reproducible benchmark suite for the auth service hot paths, written as JSON.
+
+Drives the real app against a stub Key Vault, in-process through its ASGI callable or under
+uvicorn, for /authorization, /validate and /usage at cache-hit, cache-miss, invalid-token
+and rate-limited mixes, then times parse_token, SecretCache, the rate limiters and
+UsageTracker directly. Keep one --output file per commit and pass an earlier one as
+--baseline to get the percent change of every entry.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Iterator, Optional
+
+import aiohttp
+
+from auth_service.auth import parse_token
+from auth_service.state import SecretCache, UsageTracker, create_rate_limiter
+from auth_service.vault import secret_name
+
+from ._stubs import AsyncStubCredential, AsyncStubTransport, StubVault, VAULT_URL, summarize
+
+PREFIX = "azjina"
+DASHBOARD_KEY = "bench-dashboard-key"
+ENDPOINTS = ("/authorization", "/validate", "/usage")
+MIXES = ("hit", "miss", "invalid", "rate_limited")
+RATE_LIMIT_PER_MINUTE = 60
+
+# Pinned so a run does not pick up prewarm, sync, limits or tracing from the shell.
+BASE_ENV = {
+    "AUTH_DASHBOARD_API_KEY": DASHBOARD_KEY,
+    "KEY_VAULT_URI": VAULT_URL,
+    "API_KEY_PREFIX": PREFIX,
+    "API_KEY_CACHE_PREWARM": "false",
+    "KEY_VAULT_SYNC_INTERVAL_SECONDS": "0",
+    "STATE_BACKEND": "memory",
+    "USAGE_INGEST_MODE": "sync",
+    "RATE_LIMIT_PER_MINUTE": "0",
+    "CONCURRENCY_LIMIT": "0",
+    "SERVER_TIMING_SAMPLE_RATE": "0",
+    "TRACING_EXPORTER": "none",
+    "LOG_LEVEL": "WARNING",
+    "ACCESS_LOG_SAMPLE_RATE": "0",
+}
+
+_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"authorization", f"Bearer {DASHBOARD_KEY}".encode()),
+]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    path: str
+    env: dict[str, str]
+    warmup: list[bytes]
+    bodies: list[bytes]
+
+
+def _key_id(index: int) -> str:
+    return f"bench{index:06d}"
+
+
+def _token(index: int, secret: Optional[str] = None) -> str:
+    return f"{PREFIX}_{_key_id(index)}_{secret or f'secret-{index}'}"
+
+
+def _vault(keys: int) -> StubVault:
+    return StubVault({secret_name(PREFIX, _key_id(i)): f"secret-{i}" for i in range(keys)})
+
+
+def _body(path: str, token: str) -> bytes:
+    payload: dict[str, Any] = {"token": token}
+    if path == "/usage":
+        payload["usage"] = {"total_tokens": 1}
+    return json.dumps(payload).encode()
+
+
+def _scenario(path: str, mix: str, requests: int, keys: int) -> Scenario:
+    env = dict(BASE_ENV)
+    warmup: list[str] = []
+    if mix == "hit":
+        warmup = [_token(i) for i in range(keys)]
+        tokens = [_token(i % keys) for i in range(requests)]
+    elif mix == "miss":
+        # Every request is the first sighting of its key, so each one goes to the vault.
+        # The warmup key sits past them and takes the client's first-call setup.
+        warmup = [_token(requests)]
+        tokens = [_token(i) for i in range(requests)]
+    elif mix == "invalid":
+        # Half fail to parse, half carry the wrong secret for a cached key.
+        warmup = [_token(0)]
+        tokens = [
+            f"not-a-token-{i}" if i % 2 else _token(0, f"wrong-{i}") for i in range(requests)
+        ]
+    else:
+        env["RATE_LIMIT_PER_MINUTE"] = str(RATE_LIMIT_PER_MINUTE)
+        warmup = [_token(0)]
+        tokens = [_token(0)] * requests
+    return Scenario(
+        name=f"{path.lstrip('/')}:{mix}",
+        path=path,
+        env=env,
+        warmup=[_body(path, token) for token in warmup],
+        bodies=[_body(path, token) for token in tokens],
+    )
+
+
+@contextmanager
+def _environ(env: dict[str, str]) -> Iterator[None]:
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _install_stub_vault(vault: StubVault, latency_seconds: float) -> None:
+    from azure.keyvault.secrets.aio import SecretClient
+
+    import auth_service.app as app_module
+
+    def create_secret_client(settings: Any, credential: Any) -> SecretClient:
+        transport = AsyncStubTransport(vault, latency_seconds)
+        return SecretClient(vault_url=VAULT_URL, credential=credential, transport=transport)
+
+    app_module.create_secret_client = create_secret_client  # type: ignore[assignment]
+    app_module.create_credential = lambda settings: AsyncStubCredential()  # type: ignore
+
+
+async def _drive(
+    call: Callable[[bytes], Awaitable[int]], bodies: list[bytes], concurrency: int
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    pending = iter(bodies)
+
+    async def worker() -> None:
+        for body in pending:
+            start = time.perf_counter()
+            status = await call(body)
+            latencies.append(time.perf_counter() - start)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": round(len(bodies) / elapsed),
+        **summarize(latencies),
+        "statuses": dict(sorted(statuses.items())),
+    }
+
+
+async def _call_asgi(app: Any, path: str, body: bytes) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [*_HEADERS, (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80),
+    }
+    status = 0
+    delivered = False
+
+    async def receive() -> dict:
+        nonlocal delivered
+        if delivered:
+            return {"type": "http.disconnect"}
+        delivered = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def _run_in_process(scenario: Scenario, concurrency: int) -> dict[str, Any]:
+    from auth_service.app import app
+
+    async def call(body: bytes) -> int:
+        return await _call_asgi(app, scenario.path, body)
+
+    async with app.router.lifespan_context(app):
+        for body in scenario.warmup:
+            await call(body)
+        return await _drive(call, scenario.bodies, concurrency)
+
+
+def _serve(port: int, vault_keys: int, latency_seconds: float) -> int:
+    import uvicorn
+
+    from auth_service.app import app
+
+    _install_stub_vault(_vault(vault_keys), latency_seconds)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    return 0
+
+
+async def _load(scenario: Scenario, port: int, concurrency: int) -> dict[str, Any]:
+    base = f"http://127.0.0.1:{port}"
+    headers = {name.decode(): value.decode() for name, value in _HEADERS}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+        deadline = time.monotonic() + 10.0
+        while True:
+            try:
+                async with session.get(f"{base}/healthz") as response:
+                    await response.read()
+                    break
+            except aiohttp.ClientError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.05)
+
+        async def call(body: bytes) -> int:
+            async with session.post(f"{base}{scenario.path}", data=body) as response:
+                await response.read()
+                return response.status
+
+        for body in scenario.warmup:
+            await call(body)
+        return await _drive(call, scenario.bodies, concurrency)
+
+
+def _run_uvicorn(
+    scenario: Scenario, concurrency: int, port: int, vault_keys: int, latency_ms: float
+) -> dict[str, Any]:
+    with tempfile.TemporaryFile() as log:
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.suite",
+                "--serve",
+                "--port",
+                str(port),
+                "--keys",
+                str(vault_keys),
+                "--vault-latency-ms",
+                str(latency_ms),
+            ],
+            stdout=log,
+            stderr=log,
+            env={**os.environ, **scenario.env, "PYTHONUNBUFFERED": "1"},
+        )
+        try:
+            return asyncio.run(_load(scenario, port, concurrency))
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def _time_ns(operation: Callable[[Any], object], inputs: list[Any], rounds: int = 3) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        for item in inputs:
+            operation(item)
+        best = min(best, (time.perf_counter_ns() - start) / len(inputs))
+    return round(best, 1)
+
+
+def _micro(iterations: int, keys: int) -> dict[str, float]:
+    sample = [_key_id(i % keys) for i in range(iterations)]
+    absent = [f"absent{i:06d}" for i in range(iterations)]
+    cache = SecretCache(300, max_entries=keys)
+    for key_id in sample[:keys]:
+        cache.set(key_id, "value")
+    window = create_rate_limiter("window", 1_000_000_000)
+    gcra = create_rate_limiter("gcra", 1_000_000_000)
+    tracker = UsageTracker(1_000_000_000_000)
+    valid = [_token(i % keys) for i in range(iterations)]
+    invalid = [f"not-a-token-{i}" for i in range(iterations)]
+    return {
+        "parse_token_valid_ns": _time_ns(lambda token: parse_token(token, PREFIX), valid),
+        "parse_token_invalid_ns": _time_ns(lambda token: parse_token(token, PREFIX), invalid),
+        "secret_cache_hit_ns": _time_ns(cache.lookup, sample),
+        "secret_cache_miss_ns": _time_ns(cache.lookup, absent),
+        "secret_cache_set_ns": _time_ns(lambda key_id: cache.set(key_id, "value"), sample),
+        "rate_limiter_window_ns": _time_ns(window.allow, sample),
+        "rate_limiter_gcra_ns": _time_ns(gcra.allow, sample),
+        "usage_tracker_consume_ns": _time_ns(lambda key_id: tracker.consume(key_id, 1), sample),
+    }
+
+
+def _metadata(args: argparse.Namespace) -> dict[str, Any]:
+    try:
+        commit: Optional[str] = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "server": args.server,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "keys": args.keys,
+        "vault_latency_ms": args.vault_latency_ms,
+        "iterations": args.iterations,
+    }
+
+
+def _change_pct(new: float, old: float) -> Optional[float]:
+    return round((new / old - 1) * 100, 1) if old else None
+
+
+def _compare(results: dict[str, Any], baseline: dict[str, Any]) -> dict[str, Optional[float]]:
+    # Percent change per entry: higher rps is better; lower latency and ns/op are better.
+    changes: dict[str, Optional[float]] = {}
+    for name, entry in results.get("scenarios", {}).items():
+        old = baseline.get("scenarios", {}).get(name)
+        if old is not None:
+            for field in ("rps", "p50_ms", "p99_ms", "p999_ms"):
+                changes[f"{name}.{field}"] = _change_pct(entry[field], old[field])
+    for name, value in results.get("micro", {}).items():
+        old = baseline.get("micro", {}).get(name)
+        if old is not None:
+            changes[f"micro.{name}"] = _change_pct(value, old)
+    return changes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--server", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--mixes", nargs="+", choices=MIXES, default=list(MIXES))
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--keys", type=int, default=1_000)
+    parser.add_argument("--vault-latency-ms", type=float, default=1.0)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    parser.add_argument("--skip-app", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--port", type=int, default=18081)
+    parser.add_argument("--output", type=Path, help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", type=Path, help="Earlier --output file to compare against.")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    latency = args.vault_latency_ms / 1000.0
+    if args.serve:
+        return _serve(args.port, args.keys, latency)
+
+    results: dict[str, Any] = {"meta": _metadata(args), "scenarios": {}}
+    if not args.skip_app:
+        vault_keys = max(args.keys, args.requests + 1)
+        if args.server == "asgi":
+            _install_stub_vault(_vault(vault_keys), latency)
+        for path in args.endpoints:
+            for mix in args.mixes:
+                scenario = _scenario(path, mix, args.requests, args.keys)
+                if args.server == "asgi":
+                    with _environ(scenario.env):
+                        run = asyncio.run(_run_in_process(scenario, args.concurrency))
+                else:
+                    run = _run_uvicorn(
+                        scenario, args.concurrency, args.port, vault_keys, args.vault_latency_ms
+                    )
+                results["scenarios"][scenario.name] = run
+    if not args.skip_micro:
+        results["micro"] = _micro(args.iterations, args.keys)
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        results["baseline_commit"] = baseline.get("meta", {}).get("commit")
+        results["change_pct"] = _compare(results, baseline)
+
+    rendered = json.dumps(results, indent=2)
+    if args.output is not None:
+        args.output.write_text(rendered + "\n", encoding="utf-8")
+    print(rendered)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
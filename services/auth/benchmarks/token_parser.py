@@ -0,0 +1,124 @@
+"""Tokens per second through parse_token: split + TokenParts vs. the single-pattern parser."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Annotated, Callable, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from auth_service.auth import parse_token
+from auth_service.config import KEY_ID_RE, PREFIX_RE
+
+PREFIX = "azjina"
+
+
+class _LegacyTokenParts(BaseModel):
+    prefix: Annotated[str, Field(min_length=1)]
+    key_id: Annotated[str, Field(min_length=1)]
+    secret: Annotated[str, Field(min_length=1)]
+
+    @field_validator("prefix")
+    @classmethod
+    def _validate_prefix_value(cls, value: str) -> str:
+        candidate = value.strip()
+        if candidate == "" or PREFIX_RE.match(candidate) is None:
+            raise ValueError("Invalid token prefix.")
+        return candidate
+
+    @field_validator("key_id")
+    @classmethod
+    def _validate_key_id(cls, value: str) -> str:
+        candidate = value.strip()
+        if candidate == "" or KEY_ID_RE.match(candidate) is None:
+            raise ValueError("Invalid token key id.")
+        return candidate
+
+    @field_validator("secret")
+    @classmethod
+    def _validate_secret(cls, value: str) -> str:
+        candidate = value.strip()
+        if candidate == "":
+            raise ValueError("Invalid token secret.")
+        return candidate
+
+
+def legacy_parse_token(token: str, expected_prefix: str) -> Optional[_LegacyTokenParts]:
+    # Baseline: the previous implementation of auth.parse_token.
+    raw = token.strip()
+    if raw == "":
+        return None
+    parts = raw.split("_")
+    if len(parts) < 3:
+        return None
+    prefix = parts[0].strip()
+    key_id = parts[1].strip()
+    secret = "_".join(parts[2:]).strip()
+    if prefix == "" or key_id == "" or secret == "":
+        return None
+    if prefix != expected_prefix:
+        return None
+    try:
+        return _LegacyTokenParts(prefix=prefix, key_id=key_id, secret=secret)
+    except ValueError:
+        return None
+
+
+VALID = [
+    f"{PREFIX}_bench{index:06d}_s3cret-{index}_with_underscores" for index in range(1_000)
+]
+INVALID = [
+    "garbage",
+    "",
+    f"{PREFIX}_short_secret",
+    "other_bench000001_secret",
+    f"{PREFIX}_bench000001_",
+    f"{PREFIX}_bench$00001_secret",
+    "x" * 512,
+    f"{PREFIX}_{'k' * 80}_secret",
+]
+
+
+def _rate(parse: Callable[[str, str], object], tokens: list[str], iterations: int) -> float:
+    count = 0
+    start = time.perf_counter()
+    while count < iterations:
+        for token in tokens:
+            parse(token, PREFIX)
+        count += len(tokens)
+    return count / (time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    for token in VALID + INVALID:
+        legacy = legacy_parse_token(token, PREFIX)
+        parsed = parse_token(token, PREFIX)
+        assert (legacy is None) == (parsed is None), token
+        if legacy is not None and parsed is not None:
+            assert (legacy.prefix, legacy.key_id, legacy.secret) == (
+                parsed.prefix,
+                parsed.key_id,
+                parsed.secret,
+            )
+
+    results: dict[str, object] = {"iterations": args.iterations}
+    for name, tokens in (("valid", VALID), ("invalid", INVALID)):
+        before = _rate(legacy_parse_token, tokens, args.iterations)
+        after = _rate(parse_token, tokens, args.iterations)
+        results[name] = {
+            "pydantic_per_sec": round(before),
+            "pattern_per_sec": round(after),
+            "speedup": round(after / before, 2),
+        }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
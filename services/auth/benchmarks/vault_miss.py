@@ -0,0 +1,98 @@
+"""Cache-miss latency of validate_token: sync client in to_thread vs. native async client."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from azure.keyvault.secrets import SecretClient as SyncSecretClient
+from azure.keyvault.secrets.aio import SecretClient
+
+from auth_service.config import TokenParts
+from auth_service.state import SecretCache
+from auth_service.vault import secret_name, validate_token
+
+from ._stubs import (
+    AsyncStubCredential,
+    AsyncStubTransport,
+    StubCredential,
+    StubTransport,
+    StubVault,
+    VAULT_URL,
+    summarize,
+)
+
+PREFIX = "azjina"
+
+
+def _tokens(count: int) -> list[TokenParts]:
+    return [
+        TokenParts(prefix=PREFIX, key_id=f"bench{index:06d}", secret=f"secret-{index}")
+        for index in range(count)
+    ]
+
+
+def _vault(tokens: list[TokenParts]) -> StubVault:
+    return StubVault({secret_name(t.prefix, t.key_id): t.secret for t in tokens})
+
+
+async def _timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def _run_threaded(tokens: list[TokenParts], latency: float) -> list[float]:
+    client = SyncSecretClient(
+        vault_url=VAULT_URL,
+        credential=StubCredential(),
+        transport=StubTransport(_vault(tokens), latency),
+    )
+
+    async def miss(parts: TokenParts) -> None:
+        # Baseline: the pre-async implementation of the miss path.
+        secret = await asyncio.to_thread(client.get_secret, secret_name(parts.prefix, parts.key_id))
+        assert secret.value == parts.secret
+
+    await asyncio.to_thread(client.get_secret, secret_name(tokens[0].prefix, tokens[0].key_id))
+    return await asyncio.gather(*(_timed(miss(parts)) for parts in tokens))
+
+
+async def _run_async(tokens: list[TokenParts], latency: float) -> list[float]:
+    async with SecretClient(
+        vault_url=VAULT_URL,
+        credential=AsyncStubCredential(),
+        transport=AsyncStubTransport(_vault(tokens), latency),
+    ) as client:
+        cache = SecretCache(0)
+
+        async def miss(parts: TokenParts) -> None:
+            match = await validate_token(token_parts=parts, client=client, cache=cache)
+            assert match.matched
+
+        await client.get_secret(secret_name(tokens[0].prefix, tokens[0].key_id))
+        return await asyncio.gather(*(_timed(miss(parts)) for parts in tokens))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    tokens = _tokens(args.concurrency)
+    latency = args.latency_ms / 1000.0
+    results = {
+        "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms,
+        "to_thread": summarize(asyncio.run(_run_threaded(tokens, latency))),
+        "async": summarize(asyncio.run(_run_async(tokens, latency))),
+    }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())